@@ -0,0 +1,340 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from api import page_cache
+from api.conditional import (RECIPE_META_FIELDS, cached_response,
+                             conditional_response, make_etag,
+                             patch_public_cache_control,
+                             set_conditional_headers)
+from api.ingredient_index import aget_catalogue_response
+from api.pagination import SubscriptionPagination
+from api.serializers import SubscriberSerializer
+from api.shopping_list import (astream_shopping_list,
+                               shopping_list_ingredients,
+                               shopping_list_response)
+import constant
+from api.views import IngredientViewSet, RecipeViewSet, UserViewSet
+
+READ_METHODS = ('GET', 'HEAD')
+
+_sync_recipe_list = sync_to_async(
+    RecipeViewSet.as_view(
+        {'get': 'list', 'post': 'create'},
+        basename='recipes',
+        detail=False
+    )
+)
+_sync_recipe_detail = sync_to_async(
+    RecipeViewSet.as_view({
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    }, basename='recipes', detail=True)
+)
+_sync_ingredient_list = sync_to_async(
+    IngredientViewSet.as_view(
+        {'get': 'list'},
+        basename='ingredients',
+        detail=False
+    )
+)
+_sync_subscriptions = sync_to_async(
+    UserViewSet.as_view(
+        {'get': 'subscriptions'},
+        basename='users',
+        **UserViewSet.subscriptions.kwargs
+    )
+)
+_sync_download_shopping_cart = sync_to_async(
+    RecipeViewSet.as_view(
+        {'get': 'download_shopping_cart'},
+        basename='recipes',
+        **RecipeViewSet.download_shopping_cart.kwargs
+    )
+)
+
+
+def _authenticate(drf_request):
+    """
+    Run configured DRF authenticators,
+    they query database so it is called in thread.
+    """
+
+    return drf_request.user
+
+
+async def _get_request(request):
+    """
+    Wrap request into DRF Request with authenticated user
+    or return None when it should be handled by sync view.
+    Failed authentication is left to sync view to answer
+    with regular DRF error.
+    """
+
+    if request.method not in READ_METHODS:
+        return None
+    drf_request = Request(
+        request,
+        authenticators=[
+            authenticator()
+            for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ]
+    )
+    try:
+        await sync_to_async(_authenticate)(drf_request)
+    except APIException:
+        return None
+    return drf_request
+
+
+def _get_view(viewset, request, action, **kwargs):
+    view = viewset(
+        request=request,
+        action=action,
+        format_kwarg=None,
+        args=(),
+        kwargs=kwargs
+    )
+    view.headers = {}
+    return view
+
+
+def _finalize(request, response, public_cache=True):
+    if isinstance(response, Response):
+        response.accepted_renderer = JSONRenderer()
+        response.accepted_media_type = JSONRenderer.media_type
+        response.renderer_context = {}
+        response.render()
+        patch_vary_headers(response, ('Accept',))
+    if public_cache:
+        patch_public_cache_control(request, response)
+    return response
+
+
+def _api_errors(view):
+    """
+    Answer DRF exceptions raised by async view
+    the same way APIView does.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            return _finalize(
+                request,
+                exception_handler(exc, {}),
+                public_cache=False
+            )
+    return wrapper
+
+
+@csrf_exempt
+@_api_errors
+async def recipe_list(request):
+    """
+    Async recipe list. Requests with filters validated by
+    django-filter forms are filtered in thread, rows and
+    recipes are loaded with async ORM.
+    """
+
+    drf_request = await _get_request(request)
+    if drf_request is None:
+        return await _sync_recipe_list(request)
+
+    cache_key = await page_cache.apage_cache_key(drf_request)
+    cached = await page_cache.aget_page(cache_key)
+    if cached is not None:
+        return _finalize(drf_request, cached_response(drf_request, cached))
+
+    view = _get_view(RecipeViewSet, drf_request, 'list')
+    queryset = view.get_queryset()
+    if drf_request.query_params:
+        queryset = await sync_to_async(view.filter_queryset)(queryset)
+    paginator = view.paginator
+    rows = await paginator.apaginate_queryset(
+        queryset.values(*RECIPE_META_FIELDS),
+        drf_request
+    )
+    etag = make_etag(
+        rows,
+        paginator.count,
+        paginator.get_next_link(),
+        paginator.get_previous_link(),
+    )
+    not_modified = conditional_response(drf_request, etag)
+    if not_modified is not None:
+        return _finalize(drf_request, not_modified)
+
+    recipes = await queryset.ain_bulk([row['id'] for row in rows])
+    serializer = view.get_serializer(
+        [recipes[row['id']] for row in rows if row['id'] in recipes],
+        many=True
+    )
+    response = paginator.get_paginated_response(serializer.data)
+    await page_cache.aset_page(cache_key, etag, response.data)
+    response['X-Cache'] = 'MISS'
+    return _finalize(
+        drf_request,
+        set_conditional_headers(response, etag)
+    )
+
+
+@csrf_exempt
+@_api_errors
+async def recipe_detail(request, pk):
+    """
+    Async recipe detail.
+    """
+
+    drf_request = await _get_request(request)
+    if drf_request is None:
+        return await _sync_recipe_detail(request, pk=pk)
+
+    user = drf_request.user
+    cache_key = None
+    if not user.is_authenticated:
+        cache_key = await page_cache.apage_cache_key(drf_request)
+        cached = await page_cache.aget_page(cache_key)
+        if cached is not None:
+            return _finalize(
+                drf_request,
+                cached_response(drf_request, cached)
+            )
+
+    view = _get_view(RecipeViewSet, drf_request, 'retrieve', pk=pk)
+    queryset = view.get_queryset().filter(pk=pk)
+    meta = await queryset.values(*RECIPE_META_FIELDS).afirst()
+    if meta is None:
+        return await _sync_recipe_detail(request, pk=pk)
+
+    last_modified = None if user.is_authenticated else meta['updated_at']
+    etag = make_etag(meta)
+    not_modified = conditional_response(drf_request, etag, last_modified)
+    if not_modified is not None:
+        return _finalize(drf_request, not_modified)
+
+    recipe = await queryset.afirst()
+    if recipe is None:
+        raise NotFound
+    response = Response(view.get_serializer(recipe).data)
+    if cache_key is not None:
+        await page_cache.aset_page(
+            cache_key,
+            etag,
+            response.data,
+            last_modified
+        )
+        response['X-Cache'] = 'MISS'
+    return _finalize(
+        drf_request,
+        set_conditional_headers(response, etag, last_modified)
+    )
+
+
+@csrf_exempt
+async def ingredient_list(request):
+    """
+    Async ingredient lookup.
+    """
+
+    drf_request = await _get_request(request)
+    if drf_request is None:
+        return await _sync_ingredient_list(request)
+
+    etag, ingredients = await aget_catalogue_response(
+        drf_request.query_params.get('name', '')
+    )
+    response = (
+        conditional_response(drf_request, etag)
+        or Response(ingredients)
+    )
+    response['ETag'] = etag
+    return _finalize(drf_request, response)
+
+
+@csrf_exempt
+@_api_errors
+async def subscriptions(request):
+    """
+    Async subscriptions page.
+    """
+
+    drf_request = await _get_request(request)
+    if drf_request is None or not drf_request.user.is_authenticated:
+        return await _sync_subscriptions(request)
+
+    view = _get_view(UserViewSet, drf_request, 'subscriptions')
+    view.pagination_class = SubscriptionPagination
+    queryset = view._get_subscribed_authors(drf_request).filter(
+        content_maker__subscriber=drf_request.user
+    )
+    paginator = view.paginator
+    authors = await paginator.apaginate_queryset(queryset, drf_request)
+    serializer = SubscriberSerializer(
+        authors,
+        many=True,
+        context={'request': drf_request}
+    )
+    return _finalize(
+        drf_request,
+        paginator.get_paginated_response(serializer.data),
+        public_cache=False
+    )
+
+
+@csrf_exempt
+async def download_shopping_cart(request):
+    """
+    Async shopping list download. Rows are read with
+    async iterator, so ASGI handler streams response
+    instead of buffering sync iterator.
+    """
+
+    drf_request = await _get_request(request)
+    if drf_request is None or not drf_request.user.is_authenticated:
+        return await _sync_download_shopping_cart(request)
+    try:
+        DefaultContentNegotiation().select_renderer(
+            drf_request,
+            [
+                renderer()
+                for renderer in RecipeViewSet.download_shopping_cart.kwargs[
+                    'renderer_classes'
+                ]
+            ]
+        )
+    except (APIException, Http404):
+        return await _sync_download_shopping_cart(request)
+
+    file_format = drf_request.query_params.get('format', 'txt')
+    content_type, chunks = astream_shopping_list(
+        drf_request.user.username,
+        shopping_list_ingredients(drf_request.user).aiterator(
+            chunk_size=constant.SHOPPING_LIST_CHUNK_ROWS
+        ),
+        file_format
+    )
+    return shopping_list_response(content_type, chunks, file_format)
+
+
+recipe_list.query_budget = RecipeViewSet.query_budgets['list']
+recipe_detail.query_budget = RecipeViewSet.query_budgets['retrieve']
+ingredient_list.query_budget = IngredientViewSet.query_budgets['list']
+subscriptions.query_budget = UserViewSet.query_budgets['subscriptions']
+download_shopping_cart.query_budget = RecipeViewSet.query_budgets[
+    'download_shopping_cart'
+]
@@ -0,0 +1,190 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from api.page_cache import bump_user_generation
+from recipes import cart_totals, counters
+from recipes.models import Favorite, Recipe, SubPair, ToBuyList
+
+User = get_user_model()
+
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+def _results(ids, statuses):
+    return [
+        {'id': pk, 'status': statuses.get(pk, NOT_FOUND)}
+        for pk in ids
+    ]
+
+
+def _found_recipes(model, user, recipe_ids):
+    """
+    Return dict of found recipe id to presence in
+    user collection validated with one IN query.
+    """
+
+    return dict(
+        Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).annotate(
+            in_collection=Exists(
+                model.objects.filter(user=user, recipes=OuterRef('pk'))
+            )
+        ).values_list('pk', 'in_collection')
+    )
+
+
+def _found_authors(user, author_ids):
+    return dict(
+        User.objects.filter(
+            pk__in=author_ids
+        ).annotate(
+            in_collection=Exists(
+                SubPair.objects.filter(
+                    subscriber=user,
+                    content_maker=OuterRef('pk')
+                )
+            )
+        ).values_list('pk', 'in_collection')
+    )
+
+
+def _insert_new(model, fields, rows, returning):
+    """
+    Insert rows skipping existing ones with
+    INSERT ... ON CONFLICT DO NOTHING RETURNING.
+    Return values of returning field of rows actually
+    inserted, so concurrent requests do not count them twice.
+    """
+
+    if not rows:
+        return set()
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(model._meta.get_field(field).column) for field in fields
+    )
+    placeholders = ', '.join(
+        ['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(rows)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} ({columns}) '
+            f'VALUES {placeholders} ON CONFLICT DO NOTHING '
+            f'RETURNING {quote(model._meta.get_field(returning).column)}',
+            [value for row in rows for value in row]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+@transaction.atomic
+def add_recipes(model, user, recipe_ids):
+    """
+    Add recipes to Favorite or ToBuyList of user.
+    Return per recipe results.
+    """
+
+    statuses = {
+        pk: EXISTS if in_collection else CREATED
+        for pk, in_collection
+        in _found_recipes(model, user, recipe_ids).items()
+    }
+    missing = [pk for pk, result in statuses.items() if result == CREATED]
+    created = _insert_new(
+        model,
+        ('user', 'recipes'),
+        [(user.pk, pk) for pk in missing],
+        'recipes'
+    )
+    statuses.update(
+        (pk, CREATED if pk in created else EXISTS) for pk in missing
+    )
+    if created:
+        if model is ToBuyList:
+            cart_totals.add_recipes(user.pk, sorted(created))
+        if model is Favorite:
+            counters.change_favorites_count(sorted(created), 1)
+        bump_user_generation(user.pk)
+    return _results(recipe_ids, statuses)
+
+
+@transaction.atomic
+def remove_recipes(model, user, recipe_ids):
+    """
+    Remove recipes from Favorite or ToBuyList of user.
+    Return per recipe results.
+    """
+
+    # Rows are locked and read again, so concurrent
+    # deletion of same rows is not accounted twice.
+    rows = model.objects.select_for_update().filter(
+        user=user,
+        recipes_id__in=recipe_ids
+    )
+    deleted = set(rows.values_list('recipes_id', flat=True))
+    statuses = {
+        pk: DELETED if pk in deleted else MISSING
+        for pk in Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', flat=True)
+    }
+    if deleted:
+        rows.delete()
+    return _results(recipe_ids, statuses)
+
+
+@transaction.atomic
+def subscribe(user, author_ids):
+    """
+    Subscribe user to authors.
+    Return per author results.
+    """
+
+    statuses = {
+        pk: EXISTS if in_collection else CREATED
+        for pk, in_collection in _found_authors(user, author_ids).items()
+    }
+    if user.pk in statuses:
+        statuses[user.pk] = SELF
+    missing = [pk for pk, result in statuses.items() if result == CREATED]
+    created = _insert_new(
+        SubPair,
+        ('subscriber', 'content_maker'),
+        [(user.pk, pk) for pk in missing],
+        'content_maker'
+    )
+    statuses.update(
+        (pk, CREATED if pk in created else EXISTS) for pk in missing
+    )
+    if created:
+        counters.change_subscribers_count(sorted(created), 1)
+        bump_user_generation(user.pk)
+    return _results(author_ids, statuses)
+
+
+@transaction.atomic
+def unsubscribe(user, author_ids):
+    """
+    Unsubscribe user from authors.
+    Return per author results.
+    """
+
+    rows = SubPair.objects.select_for_update().filter(
+        subscriber=user,
+        content_maker_id__in=author_ids
+    )
+    deleted = set(rows.values_list('content_maker_id', flat=True))
+    statuses = {
+        pk: DELETED if pk in deleted else MISSING
+        for pk in User.objects.filter(
+            pk__in=author_ids
+        ).values_list('pk', flat=True)
+    }
+    if deleted:
+        rows.delete()
+    return _results(author_ids, statuses)
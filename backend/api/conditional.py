@@ -0,0 +1,118 @@
+import hashlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+import constant
+
+# Fields of annotated recipe queryset rendered response depends on.
+RECIPE_META_FIELDS = (
+    'id',
+    'posting_time',
+    'updated_at',
+    'author_id',
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'author__avatar',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'is_author_subscribed',
+)
+
+_encoder = DjangoJSONEncoder()
+
+
+def make_etag(*parts):
+    """
+    Return strong ETag of json encodable parts.
+    """
+
+    return quote_etag(
+        hashlib.sha1(_encoder.encode(parts).encode()).hexdigest()
+    )
+
+
+def conditional_response(request, etag, last_modified=None):
+    """
+    Return 304/412 response for matching conditional request or None.
+    last_modified is a datetime.
+    """
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if response is not None:
+        set_conditional_headers(response, etag, last_modified)
+    return response
+
+
+def set_conditional_headers(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def cached_response(request, cached):
+    """
+    Build response from cached (etag, data, last_modified).
+    """
+
+    etag, data, last_modified = cached
+    response = (
+        conditional_response(request, etag, last_modified)
+        or Response(data)
+    )
+    response['X-Cache'] = 'HIT'
+    return set_conditional_headers(response, etag, last_modified)
+
+
+def patch_public_cache_control(request, response):
+    """
+    Mark safe response as publicly cacheable for anonymous
+    users and private otherwise. Response varies on
+    Authorization so shared caches keep them apart.
+    """
+
+    if (
+        request.method in ('GET', 'HEAD')
+        and response.status_code in (200, 304)
+    ):
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=constant.PUBLIC_CACHE_MAX_AGE
+            )
+        patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class PublicCacheControlMixin:
+    """
+    Mixin for viewsets applying patch_public_cache_control
+    to responses of public_cache_actions.
+    """
+
+    public_cache_actions = ('list', 'retrieve')
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request,
+            response,
+            *args,
+            **kwargs
+        )
+        if getattr(self, 'action', None) in self.public_cache_actions:
+            patch_public_cache_control(request, response)
+        return response
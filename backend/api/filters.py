@@ -1,6 +1,7 @@
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Recipe
+from recipes.search import search_recipes
 
 
 class RecipeFilter(filters.FilterSet):
@@ -13,6 +14,9 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
 
     def filter_is_favorited(self, queryset, _, value):
         if value and self.request.user.is_authenticated:
@@ -24,15 +28,11 @@ class RecipeFilter(filters.FilterSet):
             return queryset.filter(to_buy_lists__user=self.request.user)
         return queryset
 
-    class Meta:
-        model = Recipe
-        fields = ('author', 'is_favorited', 'is_in_shopping_cart')
-
+    def filter_search(self, queryset, _, value):
+        if value:
+            return search_recipes(queryset, value)
+        return queryset
 
-class IngredientFilter(filters.FilterSet):
-    """
-    FilterSet for IngredientViewSet.
-    """
     class Meta:
-        model = Ingredient
-        fields = ('name',)
+        model = Recipe
+        fields = ('author', 'is_favorited', 'is_in_shopping_cart', 'search')
@@ -0,0 +1,163 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+import constant
+from api.page_cache import purge_public_responses
+from recipes.models import Recipe
+from recipes.storage import variant_name
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+# Names of images with generated variants, in insertion order.
+# Variants of stored content do not change, so recorded
+# names are not checked in storage again.
+_ready = {}
+_ready_lock = threading.Lock()
+
+
+def generate_variants(source_path, targets):
+    """
+    Resize image at source_path into every
+    (target_path, size) pair. Runs in pool process.
+    """
+
+    with Image.open(source_path) as image:
+        image = image.convert(
+            'RGBA' if 'A' in image.getbands() else 'RGB'
+        )
+        for target_path, size in targets:
+            variant = image.copy()
+            variant.thumbnail(size)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            variant.save(
+                target_path,
+                quality=constant.IMAGE_VARIANT_QUALITY
+            )
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=constant.IMAGE_VARIANT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+
+def _mark_ready(name):
+    with _ready_lock:
+        _ready[name] = None
+        if len(_ready) > constant.IMAGE_VARIANTS_READY_SIZE:
+            del _ready[next(iter(_ready))]
+
+
+def variants_ready(name):
+    """
+    Return whether all variants of stored image are generated.
+    """
+
+    if name in _ready:
+        return True
+    if all(
+        default_storage.exists(variant_name(name, variant))
+        for variant in constant.IMAGE_VARIANTS
+    ):
+        _mark_ready(name)
+        return True
+    return False
+
+
+def _touch_recipes(name):
+    """
+    Mark recipes showing image as modified and drop cached
+    pages, so responses get variant urls instead of original.
+    """
+
+    # Runs in own thread, its connections are closed after.
+    try:
+        with transaction.atomic():
+            Recipe.objects.filter(
+                Q(image=name) | Q(author__avatar=name)
+            ).update(updated_at=timezone.now())
+            purge_public_responses()
+    except Exception:
+        logger.exception('Recipes showing %s were not updated', name)
+    finally:
+        connections.close_all()
+
+
+def _record_result(name):
+    def record(future):
+        if future.exception() is not None:
+            logger.error(
+                'Image variants generation failed',
+                exc_info=future.exception()
+            )
+            return
+        _mark_ready(name)
+        threading.Thread(
+            target=_touch_recipes,
+            args=(name,),
+            daemon=True
+        ).start()
+    return record
+
+
+def schedule_variants(image):
+    """
+    Generate variants of stored image in process pool
+    after current transaction is committed.
+    Already generated variants are not regenerated.
+    """
+
+    if not image or variants_ready(image.name):
+        return
+    name = image.name
+    targets = [
+        (default_storage.path(variant_name(name, variant)), size)
+        for variant, size in constant.IMAGE_VARIANTS.items()
+    ]
+    source_path = image.path
+
+    def submit():
+        _get_executor().submit(
+            generate_variants,
+            source_path,
+            targets
+        ).add_done_callback(_record_result(name))
+
+    transaction.on_commit(submit)
+
+
+def variant_urls(image, request=None):
+    """
+    Return dict of variant urls for image.
+    Original image url is used until variants are generated.
+    """
+
+    if not image:
+        return None
+    ready = variants_ready(image.name)
+    urls = {}
+    for variant in constant.IMAGE_VARIANTS:
+        url = (
+            default_storage.url(variant_name(image.name, variant))
+            if ready
+            else image.url
+        )
+        urls[variant] = (
+            request.build_absolute_uri(url) if request else url
+        )
+    return urls
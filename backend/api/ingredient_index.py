@@ -0,0 +1,247 @@
+import hashlib
+import json
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.utils.http import quote_etag
+
+import constant
+from recipes.models import Ingredient
+
+
+def get_catalogue_version():
+    """
+    Return current version of ingredient catalogue.
+    Initial value is time based so versions are not reused
+    after the counter was evicted from cache.
+    """
+
+    return cache.get_or_set(
+        constant.INGREDIENT_VERSION_KEY,
+        time.time_ns,
+        timeout=None
+    )
+
+
+async def aget_catalogue_version():
+    """
+    Async version of get_catalogue_version.
+    """
+
+    return await cache.aget_or_set(
+        constant.INGREDIENT_VERSION_KEY,
+        time.time_ns,
+        timeout=None
+    )
+
+
+def _incr_catalogue_version():
+    try:
+        cache.incr(constant.INGREDIENT_VERSION_KEY)
+    except ValueError:
+        cache.set(
+            constant.INGREDIENT_VERSION_KEY,
+            time.time_ns(),
+            timeout=None
+        )
+
+
+def bump_catalogue_version():
+    """
+    Invalidate all cached catalogue responses.
+    Version changes after commit, otherwise concurrent
+    request could cache rows read before commit under it.
+    """
+
+    transaction.on_commit(_incr_catalogue_version)
+
+
+def _ngrams(name):
+    size = constant.INGREDIENT_NGRAM_SIZE
+    return {name[start:start + size] for start in range(len(name) - size + 1)}
+
+
+class IngredientIndex:
+    """
+    In-process case-insensitive index of ingredient names.
+    Names are kept sorted so prefix lookups are binary searches,
+    substring lookups use positions of name n-grams.
+    Index is built at server start, rebuilt after commit
+    of Ingredient changes and when catalogue version changes
+    or after INGREDIENT_INDEX_TTL seconds to pick up changes
+    made by other processes with local cache.
+    """
+
+    def __init__(self, ttl=constant.INGREDIENT_INDEX_TTL):
+        self.ttl = ttl
+        self._data = None
+
+    def invalidate(self):
+        self._data = None
+        transaction.on_commit(self._rebuild)
+
+    def _rebuild(self):
+        # Several changes of one transaction rebuild index once.
+        if self._data is None:
+            self.build()
+
+    def warm_up(self):
+        """
+        Build index ahead of requests. On database errors
+        it is left to be built by the first request.
+        """
+
+        try:
+            self.build()
+        except DatabaseError:
+            self._data = None
+
+    @staticmethod
+    def _catalogue():
+        return Ingredient.objects.values(
+            'id', 'name', 'measurement_unit'
+        ).order_by()
+
+    def _set_data(self, rows, version):
+        ingredients = sorted(
+            (
+                (ingredient['name'].lower(), ingredient['id'], ingredient)
+                for ingredient in rows
+            ),
+            key=lambda item: item[:2]
+        )
+        names = [name for name, _, _ in ingredients]
+        ngrams = defaultdict(list)
+        for position, name in enumerate(names):
+            for ngram in _ngrams(name):
+                ngrams[ngram].append(position)
+        self._data = (
+            names,
+            [ingredient for _, _, ingredient in ingredients],
+            time.monotonic(),
+            version,
+            ngrams,
+        )
+        return self._data
+
+    def build(self):
+        version = get_catalogue_version()
+        return self._set_data(self._catalogue().iterator(), version)
+
+    async def abuild(self, version):
+        return self._set_data(
+            [ingredient async for ingredient in self._catalogue()],
+            version
+        )
+
+    def _is_stale(self, data, version):
+        return (
+            data is None
+            or time.monotonic() - data[2] > self.ttl
+            or data[3] != version
+        )
+
+    def _get_data(self):
+        data = self._data
+        if self._is_stale(data, get_catalogue_version()):
+            data = self.build()
+        return data
+
+    def search(self, query):
+        """
+        Return ingredients which names start with query followed
+        by at most INGREDIENT_SUBSTRING_LIMIT ingredients
+        containing query.
+        """
+
+        return self._search(self._get_data(), query)
+
+    async def asearch(self, query):
+        data = self._data
+        version = await aget_catalogue_version()
+        if self._is_stale(data, version):
+            data = await self.abuild(version)
+        return self._search(data, query)
+
+    @staticmethod
+    def _search(data, query):
+        names, ingredients, _, _, ngrams = data
+        query = query.strip().lower()
+        if not query:
+            return list(ingredients)
+
+        start = end = bisect_left(names, query)
+        while end < len(names) and names[end].startswith(query):
+            end += 1
+
+        # Names containing query contain all its n-grams,
+        # so only positions of the rarest one are checked.
+        query_ngrams = _ngrams(query)
+        positions = min(
+            (ngrams.get(ngram, ()) for ngram in query_ngrams),
+            key=len
+        ) if query_ngrams else range(len(names))
+        found = []
+        for position in positions:
+            if len(found) >= constant.INGREDIENT_SUBSTRING_LIMIT:
+                break
+            if query in names[position] and not start <= position < end:
+                found.append(ingredients[position])
+        return ingredients[start:end] + found
+
+
+ingredient_index = IngredientIndex()
+
+
+def _catalogue_cache_key(query, version):
+    return ':'.join((
+        constant.INGREDIENT_VERSION_KEY,
+        str(version),
+        hashlib.sha1(query.encode()).hexdigest(),
+    ))
+
+
+def _make_catalogue_response(ingredients):
+    return (
+        quote_etag(
+            hashlib.sha1(
+                json.dumps(ingredients, ensure_ascii=False).encode()
+            ).hexdigest()
+        ),
+        ingredients,
+    )
+
+
+def get_catalogue_response(query):
+    """
+    Return ETag and ingredients matching query.
+    Result is cached under current catalogue version,
+    ETag is hash of response content.
+    """
+
+    query = query.strip().lower()
+    key = _catalogue_cache_key(query, get_catalogue_version())
+    response = cache.get(key)
+    if response is None:
+        response = _make_catalogue_response(ingredient_index.search(query))
+        cache.set(key, response, constant.INGREDIENT_CACHE_TIMEOUT)
+    return response
+
+
+async def aget_catalogue_response(query):
+    """
+    Async version of get_catalogue_response.
+    """
+
+    query = query.strip().lower()
+    key = _catalogue_cache_key(query, await aget_catalogue_version())
+    response = await cache.aget(key)
+    if response is None:
+        response = _make_catalogue_response(
+            await ingredient_index.asearch(query)
+        )
+        await cache.aset(key, response, constant.INGREDIENT_CACHE_TIMEOUT)
+    return response
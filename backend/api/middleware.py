@@ -0,0 +1,152 @@
+import logging
+import time
+from collections import Counter
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    Execute wrapper counting queries, their total time
+    and repeated statements of one request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.view = None
+        self.budget = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return sum(
+            count - 1 for count in self.statements.values() if count > 1
+        )
+
+    def most_duplicated(self):
+        sql, count = max(
+            self.statements.items(),
+            key=lambda item: item[1],
+            default=(None, 0)
+        )
+        return sql if count > 1 else None
+
+
+def get_query_budget(request, view_func):
+    """
+    Return view name and query budget declared for it.
+    Viewsets declare query_budgets dict of action to budget,
+    function views declare query_budget attribute.
+    """
+
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return (
+            f'{view_func.__module__}.{view_func.__name__}',
+            getattr(view_func, 'query_budget', None)
+        )
+    action = (getattr(view_func, 'actions', None) or {}).get(
+        request.method.lower()
+    )
+    return (
+        f'{cls.__name__}.{action}' if action else cls.__name__,
+        getattr(cls, 'query_budgets', {}).get(action)
+    )
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count queries, DB time and duplicated SQL per request
+    with connection.execute_wrapper. Results are sent in
+    Server-Timing header and views running more queries
+    than their budget are logged.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'QUERY_INSTRUMENTATION', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = request._query_stats = QueryStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        stats = request._query_stats = QueryStats()
+        started = time.perf_counter()
+        # Async ORM runs queries in thread sensitive executor of the
+        # request, so wrapper is installed on connection of that thread.
+        wrapper = await sync_to_async(self.install)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrapper.__exit__)(None, None, None)
+        return self.finish(request, response, stats, started)
+
+    @staticmethod
+    def install(stats):
+        wrapper = connection.execute_wrapper(stats)
+        wrapper.__enter__()
+        return wrapper
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = getattr(request, '_query_stats', None)
+        if stats is not None:
+            stats.view, stats.budget = get_query_budget(request, view_func)
+
+    def finish(self, request, response, stats, started):
+        total = (time.perf_counter() - started) * 1000
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.duration * 1000:.2f};'
+            f'desc="{stats.count} queries, '
+            f'{stats.duplicates} duplicated"',
+            f'total;dur={total:.2f}',
+        ))
+        if stats.budget is not None and stats.count > stats.budget:
+            logger.warning(
+                'Query budget exceeded by %s: %s queries, budget %s',
+                stats.view,
+                stats.count,
+                stats.budget,
+                extra={
+                    'view': stats.view,
+                    'method': request.method,
+                    'path': request.path,
+                    'queries': stats.count,
+                    'budget': stats.budget,
+                    'db_ms': round(stats.duration * 1000, 2),
+                    'duplicates': stats.duplicates,
+                    'most_duplicated_sql': stats.most_duplicated(),
+                }
+            )
+        return response
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.settings import api_settings
+
+import constant
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_GENERATION_KEY = f'{constant.RECIPE_PAGE_CACHE_PREFIX}:gen'
+# Generation of pages ordered by favorites_count only.
+FAVORITES_GENERATION_KEY = f'{GLOBAL_GENERATION_KEY}:favorites'
+STATS_KEYS = {
+    True: f'{constant.RECIPE_PAGE_CACHE_PREFIX}:hits',
+    False: f'{constant.RECIPE_PAGE_CACHE_PREFIX}:misses',
+}
+
+
+def user_generation_key(user_id):
+    return f'{GLOBAL_GENERATION_KEY}:user:{user_id}'
+
+
+def _incr_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_generation(key):
+    """
+    Invalidate cached pages depending on generation key.
+    Generation changes after commit, otherwise concurrent
+    request could cache rows read before commit under it.
+    """
+
+    transaction.on_commit(lambda: _incr_generation(key))
+
+
+def bump_global_generation():
+    bump_generation(GLOBAL_GENERATION_KEY)
+
+
+def bump_favorites_generation():
+    bump_generation(FAVORITES_GENERATION_KEY)
+
+
+def _send_purge_requests(urls):
+    for url in urls:
+        try:
+            requests.request(
+                'PURGE',
+                url,
+                timeout=constant.PUBLIC_CACHE_PURGE_TIMEOUT
+            )
+        except requests.RequestException as error:
+            logger.warning('Public cache purge of %s failed: %s', url, error)
+
+
+def purge_public_responses():
+    """
+    Purge hook for data shown to anonymous users.
+    Drops server-side cached pages and, after commit, sends
+    PURGE requests to PUBLIC_CACHE_PURGE_URLS in background.
+    Without purge urls proxy copies expire by PUBLIC_CACHE_MAX_AGE.
+    """
+
+    bump_global_generation()
+    if settings.PUBLIC_CACHE_PURGE_URLS:
+        transaction.on_commit(lambda: threading.Thread(
+            target=_send_purge_requests,
+            args=(settings.PUBLIC_CACHE_PURGE_URLS,),
+            daemon=True
+        ).start())
+
+
+def bump_user_generation(user_id):
+    bump_generation(user_generation_key(user_id))
+
+
+def _generation_keys(request):
+    keys = [GLOBAL_GENERATION_KEY]
+    if 'favorites_count' in request.query_params.get(
+        api_settings.ORDERING_PARAM,
+        ''
+    ):
+        keys.append(FAVORITES_GENERATION_KEY)
+    if request.user.pk:
+        keys.append(user_generation_key(request.user.pk))
+    return keys
+
+
+def _page_key(request, generations):
+    query = '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(request.query_params.lists())
+        for value in sorted(values)
+    )
+    return ':'.join((
+        constant.RECIPE_PAGE_CACHE_PREFIX,
+        str(request.user.pk or 0),
+        *map(str, generations),
+        hashlib.sha1(
+            f'{request.get_host()}{request.path}?{query}'.encode()
+        ).hexdigest(),
+    ))
+
+
+def page_cache_key(request):
+    """
+    Return cache key of recipe page for requesting user
+    built from current generations and normalized query.
+    """
+
+    keys = _generation_keys(request)
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            generations[key] = cache.get_or_set(
+                key,
+                time.time_ns,
+                timeout=None
+            )
+    return _page_key(request, [generations[key] for key in keys])
+
+
+async def apage_cache_key(request):
+    """
+    Async version of page_cache_key.
+    """
+
+    keys = _generation_keys(request)
+    generations = await cache.aget_many(keys)
+    for key in keys:
+        if key not in generations:
+            generations[key] = await cache.aget_or_set(
+                key,
+                time.time_ns,
+                timeout=None
+            )
+    return _page_key(request, [generations[key] for key in keys])
+
+
+def get_page(key):
+    """
+    Return cached (etag, data, last_modified) of page
+    or None counting hit or miss.
+    """
+
+    page = cache.get(key)
+    stats_key = STATS_KEYS[page is not None]
+    if not cache.add(stats_key, 1, timeout=None):
+        try:
+            cache.incr(stats_key)
+        except ValueError:
+            pass
+    return page
+
+
+async def aget_page(key):
+    """
+    Async version of get_page.
+    """
+
+    page = await cache.aget(key)
+    stats_key = STATS_KEYS[page is not None]
+    if not await cache.aadd(stats_key, 1, timeout=None):
+        try:
+            await cache.aincr(stats_key)
+        except ValueError:
+            pass
+    return page
+
+
+def set_page(key, etag, data, last_modified=None):
+    cache.set(
+        key,
+        (etag, data, last_modified),
+        constant.RECIPE_PAGE_CACHE_TIMEOUT
+    )
+
+
+async def aset_page(key, etag, data, last_modified=None):
+    await cache.aset(
+        key,
+        (etag, data, last_modified),
+        constant.RECIPE_PAGE_CACHE_TIMEOUT
+    )
+
+
+def get_stats():
+    """
+    Return hits, misses and hit ratio of page cache.
+    """
+
+    stats = cache.get_many(STATS_KEYS.values())
+    hits = stats.get(STATS_KEYS[True], 0)
+    misses = stats.get(STATS_KEYS[False], 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else None,
+    }
@@ -0,0 +1,252 @@
+import base64
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination with opt-in keyset mode.
+    Keyset mode is enabled by ?pagination=cursor or ?cursor=
+    and pages by values of keyset_ordering fields, so page
+    cost does not depend on depth. Exact count is returned
+    in keyset mode only when ?count=true is passed.
+    Last field of keyset_ordering must be unique.
+    Keyset mode always orders by keyset_ordering, so
+    query parameters changing ordering are rejected with it.
+    """
+
+    keyset_ordering = None
+    ordering_query_params = ()
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering_conflict_message = 'Can not be used with cursor pagination.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.start_keyset(request):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.count = None
+        if self.count_requested(request):
+            self.count = queryset.count()
+        return self.finish_keyset(list(self.get_keyset_page(queryset)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Async version of paginate_queryset.
+        """
+
+        if not self.start_keyset(request):
+            self.request = request
+            self.limit = self.get_limit(request)
+            if self.limit is None:
+                return None
+            self.count = await queryset.acount()
+            self.offset = self.get_offset(request)
+            if self.count == 0 or self.offset > self.count:
+                return []
+            return [
+                obj async for obj
+                in queryset[self.offset:self.offset + self.limit]
+            ]
+
+        self.count = None
+        if self.count_requested(request):
+            self.count = await queryset.acount()
+        return self.finish_keyset(
+            [obj async for obj in self.get_keyset_page(queryset)]
+        )
+
+    def start_keyset(self, request):
+        """
+        Read keyset parameters of request.
+        Return whether keyset mode is used.
+        """
+
+        self.use_keyset = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+        if self.use_keyset:
+            conflicts = [
+                param for param in self.ordering_query_params
+                if request.query_params.get(param)
+            ]
+            if conflicts:
+                raise ValidationError({
+                    param: self.ordering_conflict_message
+                    for param in conflicts
+                })
+            self.request = request
+            self.limit = self.get_limit(request)
+            self.values, self.reverse = self.decode_cursor(request)
+        return self.use_keyset
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param) == 'true'
+
+    def get_keyset_page(self, queryset):
+        """
+        Return queryset of page rows with one extra row
+        telling whether more rows follow.
+        """
+
+        ordering = self.keyset_ordering
+        if self.reverse:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            )
+        queryset = queryset.order_by(*ordering)
+        if self.values is not None:
+            self.values = self.convert_values(queryset.model, self.values)
+            queryset = queryset.filter(self.get_keyset_filter(
+                ordering,
+                self.values
+            ))
+        return queryset[:self.limit + 1]
+
+    def finish_keyset(self, page):
+        has_more = len(page) > self.limit
+        page = page[:self.limit]
+        if self.reverse:
+            page.reverse()
+
+        self.next_values = self.previous_values = None
+        if page and (has_more or self.reverse):
+            self.next_values = self.get_values(page[-1])
+        if page and (
+            has_more if self.reverse else self.values is not None
+        ):
+            self.previous_values = self.get_values(page[0])
+
+        return page
+
+    def get_keyset_filter(self, ordering, values):
+        """
+        Build filter selecting rows placed after values
+        in given ordering.
+        """
+
+        conditions = []
+        for position, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            conditions.append(Q(
+                **{
+                    previous.lstrip('-'): value
+                    for previous, value in zip(
+                        ordering[:position],
+                        values
+                    )
+                },
+                **{f'{name}__{lookup}': values[position]}
+            ))
+        return reduce(operator.or_, conditions)
+
+    def get_values(self, obj):
+        if isinstance(obj, dict):
+            return [obj[field.lstrip('-')] for field in self.keyset_ordering]
+        return [
+            getattr(obj, field.lstrip('-'))
+            for field in self.keyset_ordering
+        ]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = cursor['v'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(values, list)
+            or len(values) != len(self.keyset_ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def convert_values(self, model, values):
+        """
+        Convert cursor values to python values of ordering fields.
+        """
+
+        converted = []
+        for field, value in zip(self.keyset_ordering, values):
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                converted.append(
+                    model._meta.get_field(field.lstrip('-')).to_python(value)
+                )
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return converted
+
+    def encode_cursor(self, values, reverse):
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(
+                {'v': values, 'r': int(reverse)},
+                cls=DjangoJSONEncoder
+            ).encode()
+        ).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(),
+            self.offset_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.use_keyset:
+            return super().get_next_link()
+        if self.next_values is None:
+            return None
+        return self.encode_cursor(self.next_values, False)
+
+    def get_previous_link(self):
+        if not self.use_keyset:
+            return super().get_previous_link()
+        if self.previous_values is None:
+            return None
+        return self.encode_cursor(self.previous_values, True)
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+
+class RecipePagination(KeysetPagination):
+    """
+    Pagination for recipe feed.
+    """
+
+    keyset_ordering = ('-posting_time', '-id')
+    ordering_query_params = ('ordering', 'search')
+
+
+class SubscriptionPagination(KeysetPagination):
+    """
+    Pagination for subscriptions page.
+    """
+
+    keyset_ordering = ('email', 'id')
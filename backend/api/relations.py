@@ -0,0 +1,73 @@
+from django.utils.functional import cached_property
+
+from recipes.models import Favorite, SubPair, ToBuyList
+
+
+class UserRelations:
+    """
+    Request-scoped storage of requesting user relations.
+    Every set of ids is loaded lazily with one query
+    and reused by all serializers of the request.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _load_ids(self, model, user_field, field):
+        if self.user is None or not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            model.objects.filter(
+                **{user_field: self.user}
+            ).values_list(field, flat=True)
+        )
+
+    @cached_property
+    def subscribed_ids(self):
+        """
+        Ids of authors requesting user is subscribed to.
+        """
+
+        return self._load_ids(
+            SubPair,
+            'subscriber',
+            'content_maker_id'
+        )
+
+    @cached_property
+    def favorite_ids(self):
+        """
+        Ids of recipes in favorites of requesting user.
+        """
+
+        return self._load_ids(
+            Favorite,
+            'user',
+            'recipes_id'
+        )
+
+    @cached_property
+    def to_buy_list_ids(self):
+        """
+        Ids of recipes in shopping cart of requesting user.
+        """
+
+        return self._load_ids(
+            ToBuyList,
+            'user',
+            'recipes_id'
+        )
+
+
+def get_user_relations(request):
+    """
+    Return UserRelations bound to request,
+    creating it on first call.
+    """
+
+    relations = getattr(request, '_user_relations', None)
+    if relations is None:
+        relations = UserRelations(getattr(request, 'user', None))
+        if request is not None:
+            request._user_relations = relations
+    return relations
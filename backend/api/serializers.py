@@ -1,13 +1,57 @@
+import base64
+import binascii
+import hashlib
+import os
+
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.image_variants import schedule_variants, variant_urls
+from api.relations import get_user_relations
+import constant
+from recipes import cart_totals
 from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from recipes.search import update_search_vector
 
 User = get_user_model()
 
 
+class StoredImageField(Base64ImageField):
+    """
+    Base64ImageField returning stored image of the instance
+    when payload is its url or has the same content,
+    so unchanged image is not decoded and saved again.
+    """
+
+    def to_internal_value(self, data):
+        stored = self.get_stored_image()
+        if stored and isinstance(data, str):
+            request = self.context.get('request')
+            urls = {stored.url}
+            if request is not None:
+                urls.add(request.build_absolute_uri(stored.url))
+            if data in urls:
+                return stored
+            try:
+                digest = hashlib.sha256(
+                    base64.b64decode(data.split(';base64,')[-1])
+                ).hexdigest()
+            except (binascii.Error, ValueError):
+                digest = None
+            if digest and os.path.basename(stored.name).startswith(digest):
+                return stored
+        return super().to_internal_value(data)
+
+    def get_stored_image(self):
+        instance = getattr(self.parent, 'instance', None)
+        if instance is None or isinstance(instance, (list, tuple)):
+            return None
+        return getattr(instance, self.source) or None
+
+
 class UserSerializer(BaseUserSerializer):
     """
     Serializer for User model inherited
@@ -15,12 +59,14 @@ class UserSerializer(BaseUserSerializer):
     """
 
     is_subscribed = serializers.SerializerMethodField('get_is_subscribed')
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = BaseUserSerializer.Meta.fields + (
             'is_subscribed',
             'avatar',
+            'avatar_variants',
         )
 
     def get_is_subscribed(self, obj):
@@ -28,14 +74,20 @@ class UserSerializer(BaseUserSerializer):
         Field creating function.
         """
 
-        user = self.context.get('request').user
+        annotated = getattr(obj, 'is_subscribed', None)
+        if annotated is not None:
+            return annotated
 
-        return (
-            user.is_authenticated
-            and user.subscribers.filter(
-                content_maker=obj.pk
-            ).exists()
-        )
+        return obj.pk in get_user_relations(
+            self.context.get('request')
+        ).subscribed_ids
+
+    def get_avatar_variants(self, obj):
+        """
+        Field creating function for avatar_variants.
+        """
+
+        return variant_urls(obj.avatar, self.context.get('request'))
 
 
 class AvatarSerializer(serializers.ModelSerializer):
@@ -50,6 +102,12 @@ class AvatarSerializer(serializers.ModelSerializer):
         model = User
         fields = ('avatar',)
 
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        schedule_variants(instance.avatar)
+
+        return instance
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     """
@@ -105,6 +163,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -116,23 +175,42 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
-    def _get_is_template(self, obj, menage):
+    def to_representation(self, instance):
+        """
+        Pass annotated subscription flag
+        down to the author serializer.
+        """
+
+        is_author_subscribed = getattr(
+            instance,
+            'is_author_subscribed',
+            None
+        )
+        if is_author_subscribed is not None:
+            instance.author.is_subscribed = is_author_subscribed
+
+        return super().to_representation(instance)
+
+    def _get_is_template(self, obj, menage, annotated_name):
         """
         Reusable fucntion to get fields
         of user based on menage variable.
+        Annotated value is used when present,
+        otherwise request relations are checked.
         """
-        request = self.context.get('request')
-        user = request.user
 
-        return (
-            user.is_authenticated
-            and getattr(user, menage).filter(
-                recipes=obj.pk
-            ).exists()
+        annotated = getattr(obj, annotated_name, None)
+        if annotated is not None:
+            return annotated
+
+        return obj.pk in getattr(
+            get_user_relations(self.context.get('request')),
+            menage
         )
 
     def get_is_favorited(self, obj):
@@ -140,7 +218,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         Field creating function for
         is_favorited.
         """
-        return self._get_is_template(obj, 'favorites')
+        return self._get_is_template(obj, 'favorite_ids', 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
         """
@@ -148,7 +226,19 @@ class RecipeSerializer(serializers.ModelSerializer):
         is_in_shopping_cart.
         """
 
-        return self._get_is_template(obj, 'to_buy_lists')
+        return self._get_is_template(
+            obj,
+            'to_buy_list_ids',
+            'is_in_shopping_cart'
+        )
+
+    def get_image_variants(self, obj):
+        """
+        Field creating function for
+        image_variants.
+        """
+
+        return variant_urls(obj.image, self.context.get('request'))
 
 
 class CutRecipeSerializer(serializers.ModelSerializer):
@@ -159,16 +249,27 @@ class CutRecipeSerializer(serializers.ModelSerializer):
     Postman.
     """
 
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
         read_only_fields = fields
 
+    def get_image_variants(self, obj):
+        """
+        Field creating function for
+        image_variants.
+        """
+
+        return variant_urls(obj.image, self.context.get('request'))
+
 
 class SubscriberSerializer(UserSerializer):
     """
@@ -178,9 +279,6 @@ class SubscriberSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField(
         method_name='get_recipes'
     )
-    recipes_count = serializers.IntegerField(
-        source='recipes.count'
-    )
 
     class Meta(UserSerializer.Meta):
         model = User
@@ -192,18 +290,21 @@ class SubscriberSerializer(UserSerializer):
     def get_recipes(self, obj):
         """
         Getting recipes field.
+        Prefetched limited recipes are used when present.
         """
 
-        queryset = obj.recipes.all()
         request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        if recipes_limit:
-            try:
-                queryset = queryset[
-                    :int(recipes_limit)
-                ]
-            except ValueError:
-                pass
+        queryset = getattr(obj, 'limited_recipes', None)
+        if queryset is None:
+            queryset = obj.recipes.all()
+            recipes_limit = request.GET.get('recipes_limit')
+            if recipes_limit:
+                try:
+                    queryset = queryset[
+                        :int(recipes_limit)
+                    ]
+                except ValueError:
+                    pass
 
         return CutRecipeSerializer(
             queryset,
@@ -211,20 +312,6 @@ class SubscriberSerializer(UserSerializer):
             many=True
         ).data
 
-    def get_is_subscribed(self, obj):
-        """
-        Getting is_subscribed field.
-        """
-
-        user = self.context.get('request').user
-
-        return (
-            user.is_authenticated
-            and user.subscribers.filter(
-                content_maker=obj.pk
-            ).exists()
-        )
-
 
 class CreateIngredientSerializer(serializers.ModelSerializer):
     """
@@ -257,7 +344,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     ingredients = CreateIngredientSerializer(
         many=True
     )
-    image = Base64ImageField()
+    image = StoredImageField()
 
     class Meta:
         model = Recipe
@@ -310,6 +397,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 
         return value
 
+    @transaction.atomic
     def create(self, validated_data):
         """
         Owerwriting default create inoreder
@@ -320,18 +408,91 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         author = self.context['request'].user
         recipe = Recipe.objects.create(author=author, **validated_data)
         self.create_ingredients(ingredients, recipe)
+        # Ingredients are inserted in bulk without signals.
+        update_search_vector((recipe.pk,))
+        schedule_variants(recipe.image)
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """
         Owerwriting default update.
+        Only changed ingredients and image are written,
+        shopping cart totals are updated with ingredients diff.
+        """
+
+        ingredients = validated_data.pop("ingredients")
+        new_amounts = {
+            ingredient["ingredient"].id: ingredient["amount"]
+            for ingredient in ingredients
+        }
+        old_amounts = self.update_ingredients(new_amounts, instance)
+        # Removed ingredients are accounted by delete signals.
+        cart_totals.change_recipe(
+            instance.pk,
+            {
+                ingredient_id: amount
+                for ingredient_id, amount in old_amounts.items()
+                if ingredient_id in new_amounts
+            },
+            new_amounts
+        )
+
+        image_changed = (
+            "image" in validated_data
+            and validated_data["image"] is not instance.image
+        )
+        if not image_changed:
+            validated_data.pop("image", None)
+        instance = super().update(instance, validated_data)
+        if image_changed:
+            schedule_variants(instance.image)
+
+        return instance
+
+    def update_ingredients(self, new_amounts, recipe):
+        """
+        Apply ingredients diff with deletes, amount updates and inserts.
+        Return previous amounts.
         """
 
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        self.create_ingredients(validated_data.pop("ingredients"), instance)
+        existing = {
+            row.ingredient_id: row
+            for row in IngredientInRecipe.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: row.amount
+            for ingredient_id, row in existing.items()
+        }
+        removed = old_amounts.keys() - new_amounts.keys()
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            row = existing.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        added = [
+            IngredientInRecipe(
+                ingredient_id=ingredient_id,
+                recipe=recipe,
+                amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in existing
+        ]
 
-        return super().update(instance, validated_data)
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed
+            ).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ("amount",))
+        if added:
+            IngredientInRecipe.objects.bulk_create(added)
+
+        return old_amounts
 
     def create_ingredients(self, ingredients, recipe):
         """
@@ -352,3 +513,19 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             instance,
             context=self.context
         ).data
+
+
+class BatchIdsSerializer(serializers.Serializer):
+    """
+    Serializer for list of ids in batch requests.
+    Duplicated ids are dropped keeping order.
+    """
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=constant.BATCH_MAX_SIZE
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
@@ -0,0 +1,186 @@
+import csv
+import datetime
+import json
+
+from django.db.models import F
+from django.http import StreamingHttpResponse
+
+import constant
+from recipes.models import ToBuyListTotal
+
+
+class _Echo:
+    """
+    File-like object returning written value
+    so csv.writer can be used in generators.
+    """
+
+    def write(self, value):
+        return value
+
+
+_csv_writer = csv.writer(_Echo())
+
+
+def _txt_header(username):
+    return (
+        f'Список покупок {username}'
+        f' ({datetime.datetime.now()}) - \n\n'
+        'Ингридиенты:\n'
+    )
+
+
+def _txt_row(number, ingredient):
+    return (
+        f'{number}. {ingredient["name"].capitalize()} '
+        f'({ingredient["measurement_unit"]})'
+        f' - {ingredient["total"]}\n'
+    )
+
+
+def _csv_header(username):
+    return _csv_writer.writerow(('name', 'measurement_unit', 'total'))
+
+
+def _csv_row(number, ingredient):
+    return _csv_writer.writerow((
+        ingredient['name'],
+        ingredient['measurement_unit'],
+        ingredient['total'],
+    ))
+
+
+def _json_header(username):
+    return (
+        '{"user": ' + json.dumps(username, ensure_ascii=False)
+        + ', "ingredients": ['
+    )
+
+
+def _json_row(number, ingredient):
+    return (
+        ('' if number == 1 else ', ')
+        + json.dumps(ingredient, ensure_ascii=False)
+    )
+
+
+# format: content type, header, row and footer
+SHOPPING_LIST_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', _txt_header, _txt_row, ''),
+    'csv': ('text/csv; charset=utf-8', _csv_header, _csv_row, ''),
+    'json': ('application/json', _json_header, _json_row, ']}'),
+}
+
+
+def _chunked(lines):
+    """
+    Send first line at once, so download starts without
+    waiting for rows, and join the rest into chunks of
+    SHOPPING_LIST_CHUNK_ROWS to avoid sending every row separately.
+    """
+
+    lines = iter(lines)
+    yield next(lines)
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= constant.SHOPPING_LIST_CHUNK_ROWS:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+async def _achunked(lines):
+    """
+    Async counterpart of _chunked.
+    """
+
+    yield await lines.__anext__()
+    chunk = []
+    async for line in lines:
+        chunk.append(line)
+        if len(chunk) >= constant.SHOPPING_LIST_CHUNK_ROWS:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _lines(file_format, username, ingredients):
+    _, header, row, footer = SHOPPING_LIST_FORMATS[file_format]
+    yield header(username)
+    for number, ingredient in enumerate(ingredients, start=1):
+        yield row(number, ingredient)
+    if footer:
+        yield footer
+
+
+async def _alines(file_format, username, ingredients):
+    _, header, row, footer = SHOPPING_LIST_FORMATS[file_format]
+    yield header(username)
+    number = 0
+    async for ingredient in ingredients:
+        number += 1
+        yield row(number, ingredient)
+    if footer:
+        yield footer
+
+
+def shopping_list_ingredients(user):
+    """
+    Return queryset of shopping list rows of user
+    as dicts with name, measurement_unit and total keys.
+    """
+
+    return ToBuyListTotal.objects.filter(
+        user=user
+    ).values(
+        'total',
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+    ).order_by(
+        'name'
+    )
+
+
+def stream_shopping_list(username, ingredients, file_format):
+    """
+    Return content type and generator of
+    shopping list chunks in requested format.
+    Ingredients must be an iterable of dicts
+    with name, measurement_unit and total keys.
+    """
+
+    return (
+        SHOPPING_LIST_FORMATS[file_format][0],
+        _chunked(_lines(file_format, username, ingredients))
+    )
+
+
+def astream_shopping_list(username, ingredients, file_format):
+    """
+    Same as stream_shopping_list for async iterable
+    of ingredients, returns async generator of chunks
+    which ASGI handler sends without buffering.
+    """
+
+    return (
+        SHOPPING_LIST_FORMATS[file_format][0],
+        _achunked(_alines(file_format, username, ingredients))
+    )
+
+
+def shopping_list_response(content_type, chunks, file_format):
+    """
+    Return streaming attachment response of shopping list.
+    """
+
+    filename = f'{constant.SHOPPING_LIST_FILENAME}.{file_format}'
+    return StreamingHttpResponse(
+        chunks,
+        content_type=content_type,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"'
+        },
+    )
@@ -0,0 +1,103 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from api.ingredient_index import bump_catalogue_version, ingredient_index
+from api.page_cache import (bump_favorites_generation, bump_user_generation,
+                            purge_public_responses)
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            SubPair, ToBuyList, User)
+from recipes.signals import favorites_count_changed, ingredients_changed
+
+# User fields shown on author cards of recipe pages.
+AUTHOR_CARD_FIELDS = ('username', 'first_name', 'last_name', 'avatar')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver(ingredients_changed)
+def invalidate_ingredient_index(**kwargs):
+    """
+    Drop ingredient index and cached catalogue
+    responses on any ingredient change.
+    """
+
+    # Both act after commit, index is rebuilt under new version.
+    bump_catalogue_version()
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver(ingredients_changed)
+def invalidate_recipe_pages(**kwargs):
+    """
+    Drop cached recipe pages of all users
+    and purge public responses.
+    """
+
+    purge_public_responses()
+
+
+@receiver(pre_save, sender=User)
+def remember_author_card(instance, update_fields=None, **kwargs):
+    """
+    Keep author card fields of changed user before save.
+    """
+
+    instance._author_card = None
+    if instance._state.adding or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_CARD_FIELDS)
+    ):
+        return
+    instance._author_card = User.objects.filter(
+        pk=instance.pk
+    ).values(*AUTHOR_CARD_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_recipe_pages_on_author_card(instance, **kwargs):
+    """
+    Drop cached recipe pages when author card of user
+    changed. New users have no recipes to show.
+    """
+
+    previous = getattr(instance, '_author_card', None)
+    if previous and any(
+        getattr(instance, field) != previous[field]
+        for field in AUTHOR_CARD_FIELDS
+    ):
+        purge_public_responses()
+
+
+@receiver(post_delete, sender=User)
+def invalidate_recipe_pages_on_user_delete(**kwargs):
+    purge_public_responses()
+
+
+@receiver(favorites_count_changed)
+def invalidate_recipe_pages_on_favorites_count(**kwargs):
+    """
+    Drop cached recipe pages ordered by favorites_count.
+    """
+
+    bump_favorites_generation()
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ToBuyList)
+def invalidate_user_recipe_pages(instance, **kwargs):
+    """
+    Drop cached recipe pages of user whose relations changed.
+    """
+
+    bump_user_generation(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=SubPair)
+def invalidate_subscriber_recipe_pages(instance, **kwargs):
+    """
+    Drop cached recipe pages of subscriber.
+    """
+
+    bump_user_generation(instance.subscriber_id)
@@ -1,4 +1,5 @@
 from rest_framework.routers import SimpleRouter
+from django.conf import settings
 from django.urls import include, path
 
 from .views import UserViewSet, IngredientViewSet, RecipeViewSet
@@ -33,3 +34,17 @@ urlpatterns = [
         include('djoser.urls.authtoken')
     ),
 ]
+
+if settings.ASYNC_API:
+    from . import async_views
+
+    urlpatterns = [
+        path('recipes/', async_views.recipe_list),
+        path('recipes/<int:pk>/', async_views.recipe_detail),
+        path('ingredients/', async_views.ingredient_list),
+        path('users/subscriptions/', async_views.subscriptions),
+        path(
+            'recipes/download_shopping_cart/',
+            async_views.download_shopping_cart
+        ),
+    ] + urlpatterns
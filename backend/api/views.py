@@ -1,28 +1,72 @@
-import datetime
-import io
+from functools import lru_cache
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db import IntegrityError, transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef,
+                              Prefetch, Value, Window)
+from django.db.models.functions import RowNumber
+from django.http import Http404, HttpResponsePermanentRedirect
 from django.shortcuts import get_object_or_404, reverse
+from django.utils.http import parse_etags
 from django_filters import rest_framework
 from djoser import views
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticatedOrReadOnly
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from api.filters import IngredientFilter, RecipeFilter
+from api import batch, page_cache
+from api.conditional import (RECIPE_META_FIELDS, PublicCacheControlMixin,
+                             cached_response, conditional_response, make_etag,
+                             set_conditional_headers)
+from api.filters import RecipeFilter
+from api.ingredient_index import get_catalogue_response
+from api.pagination import RecipePagination, SubscriptionPagination
 from api.permissions import IsAuthorOrReadOnlyPermission
-from api.serializers import (AvatarSerializer, CreateRecipeSerializer,
-                             CutRecipeSerializer, IngredientSerializer,
-                             RecipeSerializer, SubscriberSerializer)
-from recipes.models import Favorite, Ingredient, Recipe, SubPair, ToBuyList
+from api.renderers import CSVRenderer, PlainTextRenderer
+from api.serializers import (AvatarSerializer, BatchIdsSerializer,
+                             CreateRecipeSerializer, CutRecipeSerializer,
+                             IngredientSerializer, RecipeSerializer,
+                             SubscriberSerializer)
+from api.shopping_list import (shopping_list_ingredients,
+                               shopping_list_response,
+                               stream_shopping_list)
+import constant
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShortLink, SubPair, ToBuyList)
 
 User = get_user_model()
 
 
+@lru_cache(maxsize=constant.SHORT_LINK_CACHE_SIZE)
+def _resolve_short_link(code):
+    """
+    Return recipe id of short link code.
+    Missing codes raise ShortLink.DoesNotExist and are not cached.
+    """
+
+    return ShortLink.objects.values_list(
+        'recipe_id',
+        flat=True
+    ).get(code=code)
+
+
+def short_link_redirect(request, code):
+    """
+    Redirect short link to recipe page.
+    """
+
+    try:
+        recipe_id = _resolve_short_link(code)
+    except ShortLink.DoesNotExist:
+        raise Http404
+    return HttpResponsePermanentRedirect(
+        constant.SHORT_LINK_REDIRECT.format(recipe_id=recipe_id)
+    )
+
+
 class UserViewSet(views.UserViewSet):
     """
     CRUD allowing viewset for User.
@@ -34,6 +78,19 @@ class UserViewSet(views.UserViewSet):
 
     queryset = User.objects.all()
 
+    # Queries per action, exceeding them is logged
+    # by QueryInstrumentationMiddleware.
+    query_budgets = {
+        'list': 5,
+        'retrieve': 4,
+        'create': 6,
+        'get_me': 3,
+        'avatar': 4,
+        'subscriptions': 5,
+        'subscribe': 10,
+        'subscribe_batch': 7,
+    }
+
     @action(
         detail=False,
         methods=('put', 'delete'),
@@ -63,7 +120,6 @@ class UserViewSet(views.UserViewSet):
                 status=status.HTTP_200_OK
             )
 
-        user.avatar.delete(save=True)
         user.avatar = None
         user.save()
         return Response(
@@ -82,19 +138,52 @@ class UserViewSet(views.UserViewSet):
         """
         return super().me(request)
 
+    def _get_subscribed_authors(self, request):
+        """
+        Authors prefetched with top recipes_limit
+        recipes per author, ranked
+        by a window function so the limit is applied in one query.
+        """
+
+        recipes = Recipe.objects.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('posting_time').desc(), F('pk').desc())
+            )
+        )
+        try:
+            recipes_limit = int(request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            recipes_limit = None
+        # Invalid and negative limits are ignored, as slicing did.
+        if recipes_limit is not None and recipes_limit >= 0:
+            recipes = recipes.filter(row_number__lte=recipes_limit)
+
+        return self.get_queryset().annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=recipes,
+                to_attr='limited_recipes'
+            )
+        )
+
     @action(
         detail=False,
         methods=('get',),
         url_path='subscriptions',
-        permission_classes=(permissions.IsAuthenticated,)
+        permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=SubscriptionPagination,
     )
     def subscriptions(self, request):
         """
         Get subscribed pages.
         """
 
-        queryset = self.get_queryset().filter(
-            subscribers__subscriber=request.user
+        queryset = self._get_subscribed_authors(request).filter(
+            content_maker__subscriber=request.user
         )
         pages = self.paginate_queryset(queryset)
         serializer = SubscriberSerializer(
@@ -129,12 +218,13 @@ class UserViewSet(views.UserViewSet):
                 raise ValidationError(
                     'You are already subscribed to this user!'
                 )
-            SubPair.objects.create(
-                subscriber=user,
-                content_maker=author
-            )
+            with transaction.atomic():
+                SubPair.objects.create(
+                    subscriber=user,
+                    content_maker=author
+                )
             serializer = SubscriberSerializer(
-                author,
+                self._get_subscribed_authors(request).get(pk=author.pk),
                 context={'request': request}
             )
             return Response(
@@ -147,12 +237,38 @@ class UserViewSet(views.UserViewSet):
             .filter(content_maker=author)
         )
         if subpairsearch:
-            subpairsearch[0].delete()
+            with transaction.atomic():
+                subpairsearch[0].delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='subscribe/batch',
+        url_name='subscribe_batch',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def subscribe_batch(self, request):
+        """
+        Subscribe/Unsubscribe to list of authors.
+        """
+
+        serializer = BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        handler = (
+            batch.subscribe if request.method == 'POST'
+            else batch.unsubscribe
+        )
+        return Response(
+            {'results': handler(
+                request.user,
+                serializer.validated_data['ids']
+            )}
+        )
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(PublicCacheControlMixin, viewsets.ModelViewSet):
     permission_classes = (
         IsAuthenticatedOrReadOnly,
         IsAuthorOrReadOnlyPermission,
@@ -161,12 +277,177 @@ class RecipeViewSet(viewsets.ModelViewSet):
     page_size_query_param = ('limit',)
 
     queryset = Recipe.objects.all()
+    pagination_class = RecipePagination
 
     filter_backends = (
         rest_framework.DjangoFilterBackend,
-        filters.SearchFilter,
+        filters.OrderingFilter,
     )
     filterset_class = RecipeFilter
+    ordering_fields = ('posting_time', 'favorites_count', 'cooking_time')
+
+    # Queries per action, exceeding them is logged
+    # by QueryInstrumentationMiddleware.
+    query_budgets = {
+        'list': 6,
+        'retrieve': 5,
+        'create': 25,
+        'update': 30,
+        'partial_update': 30,
+        'destroy': 20,
+        'favorite': 10,
+        'shopping_cart': 15,
+        'favorite_batch': 8,
+        'shopping_cart_batch': 12,
+        'download_shopping_cart': 3,
+        'return_short_link': 4,
+        'cache_stats': 2,
+    }
+
+    def get_queryset(self):
+        """
+        Build one annotated queryset so serializing a page
+        costs a constant number of queries.
+        """
+
+        queryset = Recipe.objects.select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch(
+                'recipe_ingredient',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+        user = self.request.user
+
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(
+                    False,
+                    output_field=BooleanField()
+                ),
+                is_author_subscribed=Value(
+                    False,
+                    output_field=BooleanField()
+                ),
+            )
+
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(
+                    user=user,
+                    recipes=OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=Exists(
+                ToBuyList.objects.filter(
+                    user=user,
+                    recipes=OuterRef('pk')
+                )
+            ),
+            is_author_subscribed=Exists(
+                SubPair.objects.filter(
+                    subscriber=user,
+                    content_maker=OuterRef('author')
+                )
+            ),
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serve page from per-user cache when possible.
+        Otherwise paginate lightweight metadata rows first and
+        answer with 304 when page ETag matches, or serialize
+        recipes of the page.
+        """
+
+        cache_key = page_cache.page_cache_key(request)
+        cached = page_cache.get_page(cache_key)
+        if cached is not None:
+            return cached_response(request, cached)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.paginate_queryset(queryset.values(*RECIPE_META_FIELDS))
+        paginated = rows is not None
+        if not paginated:
+            rows = list(queryset.values(*RECIPE_META_FIELDS))
+
+        etag = make_etag(
+            rows,
+            getattr(self.paginator, 'count', None),
+            self.paginator.get_next_link() if paginated else None,
+            self.paginator.get_previous_link() if paginated else None,
+        )
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        recipes = queryset.in_bulk([row['id'] for row in rows])
+        serializer = self.get_serializer(
+            [recipes[row['id']] for row in rows if row['id'] in recipes],
+            many=True
+        )
+        if paginated:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        page_cache.set_page(cache_key, etag, response.data)
+        response['X-Cache'] = 'MISS'
+        return set_conditional_headers(response, etag)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='cache_stats',
+        url_name='cache_stats',
+        permission_classes=(permissions.IsAdminUser,)
+    )
+    def cache_stats(self, request):
+        """
+        Return hit/miss statistics of recipe page cache.
+        """
+
+        return Response(page_cache.get_stats())
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Answer with 304 when recipe metadata did not change
+        before serializing it. Anonymous responses are
+        served from shared page cache.
+        """
+
+        cache_key = None
+        if not request.user.is_authenticated:
+            cache_key = page_cache.page_cache_key(request)
+            cached = page_cache.get_page(cache_key)
+            if cached is not None:
+                return cached_response(request, cached)
+
+        try:
+            meta = self.get_queryset().filter(
+                pk=kwargs[self.lookup_field]
+            ).values(*RECIPE_META_FIELDS).first()
+        except (TypeError, ValueError):
+            meta = None
+        if meta is None:
+            raise Http404
+
+        last_modified = (
+            None if request.user.is_authenticated else meta['updated_at']
+        )
+        etag = make_etag(meta)
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().retrieve(request, *args, **kwargs)
+        if cache_key is not None:
+            page_cache.set_page(cache_key, etag, response.data, last_modified)
+            response['X-Cache'] = 'MISS'
+        return set_conditional_headers(response, etag, last_modified)
 
     def get_serializer_class(self):
         if self.action not in SAFE_METHODS:
@@ -180,10 +461,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if request.method == 'POST':
-            collection, created = model.objects.get_or_create(
-                user=request.user,
-                recipes=recipe,
-            )
+            with transaction.atomic():
+                collection, created = model.objects.get_or_create(
+                    user=request.user,
+                    recipes=recipe,
+                )
 
             if created:
                 return Response(
@@ -195,11 +477,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        get_object_or_404(
-            model,
-            user=request.user,
-            recipes=pk
-        ).delete()
+        with transaction.atomic():
+            get_object_or_404(
+                model,
+                user=request.user,
+                recipes=pk
+            ).delete()
         return Response(
             status=status.HTTP_204_NO_CONTENT
         )
@@ -253,63 +536,65 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'Recipe is already in the cart!'
         )
 
-    def _download_file(self, request, ingredients):
-        file_head = (
-            f'Список покупок {request.user.username}'
-            + f' ({datetime.datetime.now()}) - \n'
+    def _batch_fav_and_cart(self, request, model):
+        serializer = BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        handler = (
+            batch.add_recipes if request.method == 'POST'
+            else batch.remove_recipes
         )
-
-        file_ingredients = (
-            'Ингридиенты:\n'
-            + '\n'.join(
-                f'''{i}. {ingredient[
-                    'recipes__recipe_ingredient__ingredient__name'
-                ].capitalize()} '''
-                f'''({ingredient[
-                    'recipes__recipe_ingredient__ingredient__measurement_unit'
-                ]})'''
-                f''' - {ingredient['total']}'''
-                for i, ingredient in enumerate(ingredients, start=1)
-            )
+        return Response(
+            {'results': handler(
+                model,
+                request.user,
+                serializer.validated_data['ids']
+            )}
         )
 
-        file_content = '\n'.join([
-            file_head,
-            file_ingredients,
-        ])
-
-        file_content = io.BytesIO(file_content.encode('utf-8'))
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite/batch',
+        url_name='favorite_batch',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        return self._batch_fav_and_cart(request, Favorite)
 
-        return file_content
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart/batch',
+        url_name='shopping_cart_batch',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        return self._batch_fav_and_cart(request, ToBuyList)
 
     @action(
         detail=False,
         methods=('get',),
         url_path='download_shopping_cart',
         url_name='download_shopping_cart',
-        permission_classes=(permissions.IsAuthenticated,)
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(JSONRenderer, PlainTextRenderer, CSVRenderer),
     )
     def download_shopping_cart(self, request):
-        ingredients = ToBuyList.objects.filter(
-            user=request.user
-        ).values(
-            'recipes__recipe_ingredient__ingredient__name',
-            'recipes__recipe_ingredient__ingredient__measurement_unit'
-        ).annotate(
-            total=Sum('recipes__recipe_ingredient__amount')
-        ).order_by(
-            'recipes__recipe_ingredient__ingredient__name'
-        )
+        """
+        Stream shopping list in txt, csv or json format
+        reading ingredients with server-side cursor.
+        Unknown formats are rejected by content negotiation.
+        """
 
-        return FileResponse(
-            self._download_file(
-                request=request,
-                ingredients=ingredients
+        file_format = request.query_params.get('format', 'txt')
+        content_type, chunks = stream_shopping_list(
+            request.user.username,
+            shopping_list_ingredients(request.user).iterator(
+                chunk_size=constant.SHOPPING_LIST_CHUNK_ROWS
             ),
-            as_attachment=True,
-            filename='shopping-list.txt',
-            content_type='text/plain',
+            file_format
         )
+        return shopping_list_response(content_type, chunks, file_format)
 
     @action(
         detail=True,
@@ -320,19 +605,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def return_short_link(self, request, pk):
         """
         Return short link for recipe.
+        Link is stored with one insert ignoring conflicts.
         """
 
-        get_object_or_404(Recipe, pk=pk)
+        try:
+            recipe_id = int(pk)
+        except ValueError:
+            raise Http404
+        code = ShortLink.code_for(recipe_id)
+        try:
+            with transaction.atomic():
+                ShortLink.objects.bulk_create(
+                    (ShortLink(recipe_id=recipe_id, code=code),),
+                    ignore_conflicts=True
+                )
+        except IntegrityError:
+            raise Http404
+
         short_link = request.build_absolute_uri(
             reverse(
-                'api:recipes-detail',
-                kwargs={'pk': pk}
+                'short-link',
+                kwargs={'code': code}
             )
         )
         return Response({'short-link': short_link})
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(PublicCacheControlMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """
     CRUD allowing viewset for Ingridents.
     """
@@ -342,10 +642,27 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
 
-    filter_backends = (
-        filters.SearchFilter,
-    )
-    filterset_class = IngredientFilter
-    search_fields = ('=name',)
-
     pagination_class = None
+
+    query_budgets = {
+        'list': 2,
+        'retrieve': 2,
+    }
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serve ingredients from in-process index,
+        prefix matches of name go first. Responses are
+        cached per catalogue version and carry ETag.
+        """
+
+        etag, ingredients = get_catalogue_response(
+            request.query_params.get('name', '')
+        )
+        headers = {'ETag': etag}
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers=headers
+            )
+        return Response(ingredients, headers=headers)
@@ -12,9 +12,93 @@ INGREDIENT_MAX_MU = 64
 # Recipe
 RECIPE_MAX_NAME = 256
 RECIPE_COOKING_TIME_LIMIT_VALUE = 1
+RECIPE_SEARCH_CONFIG = 'russian'
+
+# ShortLink
+SHORT_LINK_ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+)
+SHORT_LINK_MAX_LENGTH = 16
+SHORT_LINK_CACHE_SIZE = 4096
+SHORT_LINK_REDIRECT = '/recipes/{recipe_id}'
 
 # IngredientInRecipe
 ING_IN_REC_AMOUNT_LIMIT_VALUE = 1
 
 # populate_ingredients
 DATA_COPY_PATH = 'data_copy'
+DATA_PATH = 'data'
+POPULATE_BATCH_SIZE = 1000
+POPULATE_READ_CHUNK = 64 * 1024
+
+# shopping list export
+SHOPPING_LIST_FILENAME = 'shopping-list'
+SHOPPING_LIST_CHUNK_ROWS = 500
+
+# ingredient index
+INGREDIENT_INDEX_TTL = 300
+INGREDIENT_NGRAM_SIZE = 3
+INGREDIENT_SUBSTRING_LIMIT = 100
+INGREDIENT_VERSION_KEY = 'ingredients:version'
+INGREDIENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# image variants
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+IMAGE_VARIANTS_DIR = 'variants'
+IMAGE_VARIANT_EXTENSION = 'webp'
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = 2
+IMAGE_VARIANTS_READY_SIZE = 100000
+
+# content addressed storage
+RECIPE_IMAGE_UPLOAD_TO = 'recipes/images/'
+AVATAR_UPLOAD_TO = 'media/avatars/'
+MEDIA_GC_GRACE_SECONDS = 60 * 60
+
+# recipe page cache
+RECIPE_PAGE_CACHE_TIMEOUT = 60 * 5
+RECIPE_PAGE_CACHE_PREFIX = 'recipes:page'
+
+# public cache
+PUBLIC_CACHE_MAX_AGE = 10
+PUBLIC_CACHE_PURGE_TIMEOUT = 2
+
+# admin
+ADMIN_LIST_PER_PAGE = 50
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# batch endpoints
+BATCH_MAX_SIZE = 100
+
+# serving benchmark
+BENCHMARK_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=6&offset=60',
+    '/api/ingredients/?name=са',
+    '/api/users/subscriptions/?recipes_limit=3',
+)
+BENCHMARK_REQUESTS = 2000
+BENCHMARK_CONCURRENCY = 64
+BENCHMARK_TIMEOUT = 30
+
+# endpoint benchmark
+BENCHMARK_ITERATIONS = 200
+
+# generate_fake_data
+FAKE_PREFIX = 'fake'
+FAKE_PASSWORD = 'fake-password'
+FAKE_IMAGE = 'recipes/images/fake.png'
+FAKE_UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+FAKE_CHUNK_SIZE = 10000
+FAKE_ZIPF_EXPONENT = 1.1
+FAKE_COUNT_SIGMA = 1.0
+FAKE_AMOUNT_MAX = 1000
+FAKE_COOKING_TIME_MAX = 600
+FAKE_POSTING_DAYS = 3 * 365
+
+# check_query_plans
+QUERY_PLAN_SEQ_SCAN_ROWS = 10000
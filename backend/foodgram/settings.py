@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -29,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,6 +72,32 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+# Urls receiving PURGE request when public responses change,
+# for proxies with purge support.
+PUBLIC_CACHE_PURGE_URLS = [
+    url for url in os.getenv('PUBLIC_CACHE_PURGE_URLS', '').split(',') if url
+]
+
+# Count queries per request, send Server-Timing header
+# and log views exceeding query_budgets. Off unless DEBUG,
+# header exposes query counts and timings to clients.
+QUERY_INSTRUMENTATION = (
+    os.getenv('QUERY_INSTRUMENTATION', str(DEBUG)).lower() == 'true'
+)
+
+# Serve hot read endpoints with async views, enabled by foodgram.asgi.
+ASYNC_API = os.getenv('ASYNC_API', 'False').lower() == 'true'
+
 AUTH_USER_MODEL = 'recipes.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -3,6 +3,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from api.views import short_link_redirect
+
 urlpatterns = [
     path(
         'api/',
@@ -12,6 +14,11 @@ urlpatterns = [
         'admin/',
         admin.site.urls
     ),
+    path(
+        's/<str:code>',
+        short_link_redirect,
+        name='short-link'
+    ),
 ]
 
 if settings.DEBUG:
@@ -1,19 +1,62 @@
+import json
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.utils.safestring import mark_safe
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+from django.utils.html import format_html_join
 
+import constant
 from .models import (
     User,
     SubPair,
     Ingredient,
+    IngredientInRecipe,
     Recipe,
     ToBuyList,
     Favorite
 )
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting exactly only small results.
+    Bigger results are estimated by the PostgreSQL planner.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        limit = constant.ADMIN_EXACT_COUNT_LIMIT
+        exact = queryset[:limit + 1].count()
+        if exact <= limit:
+            return exact
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.count()
+        plan = json.loads(queryset.explain(format='json'))
+        return max(int(plan[0]['Plan']['Plan Rows']), exact)
+
+
+class ScalableMixin:
+    """
+    Admin options for big tables.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = constant.ADMIN_LIST_PER_PAGE
+
+
+class ScalableAdmin(ScalableMixin, admin.ModelAdmin):
+    """
+    Base admin for big tables.
+    """
+
+
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ScalableMixin, BaseUserAdmin):
     """
     Class to add User to admin.
     """
@@ -24,7 +67,9 @@ class UserAdmin(BaseUserAdmin):
         'username',
         'first_name',
         'last_name',
-        'avatar'
+        'avatar',
+        'recipes_count',
+        'subscribers_count'
     )
     search_fields = (
         'email',
@@ -33,7 +78,7 @@ class UserAdmin(BaseUserAdmin):
 
 
 @admin.register(SubPair)
-class SubPairAdmin(admin.ModelAdmin):
+class SubPairAdmin(ScalableAdmin):
     """
     Class to add SubPair to admin.
     """
@@ -43,6 +88,14 @@ class SubPairAdmin(admin.ModelAdmin):
         'subscriber',
         'content_maker'
     )
+    list_select_related = (
+        'subscriber',
+        'content_maker'
+    )
+    autocomplete_fields = (
+        'subscriber',
+        'content_maker'
+    )
     search_fields = (
         'subscriber__username',
         'content_maker__username',
@@ -52,7 +105,7 @@ class SubPairAdmin(admin.ModelAdmin):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ScalableAdmin):
     """
     Class to add Ingredient to admin.
     """
@@ -63,12 +116,32 @@ class IngredientAdmin(admin.ModelAdmin):
         'measurement_unit',
     )
     search_fields = (
+        '^name',
+    )
+    ordering = (
         'name',
     )
 
 
+class IngredientInRecipeInline(admin.TabularInline):
+    """
+    Ingredients of the recipe with autocomplete
+    instead of the whole catalogue in select.
+    """
+
+    model = IngredientInRecipe
+    autocomplete_fields = (
+        'ingredient',
+    )
+    extra = 0
+    min_num = 1
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
+
+
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ScalableAdmin):
     """
     Class to add Recipe to admin.
     """
@@ -81,46 +154,60 @@ class RecipeAdmin(admin.ModelAdmin):
         'cooking_time',
         'author',
         'get_ingredients',
-        'get_fav'
+        'favorites_count'
+    )
+    list_select_related = (
+        'author',
+    )
+    autocomplete_fields = (
+        'author',
+    )
+    inlines = (
+        IngredientInRecipeInline,
     )
     search_fields = (
         'author__username',
         'name'
     )
 
-    @admin.display(description="Ингридиенты")
-    def get_ingredients(self, obj):
+    def get_queryset(self, request):
         """
-        Return safe-string with information of amount, MU and
-        name of the ingredient.
+        Recipes with ingredients prefetched in one query per page.
         """
 
-        in_obj = obj.recipe_ingredient.all()
-        safe_str = mark_safe(
-            '<br>'.join(
-                f'''{ing.ingredient.name} \
-                ({ing.ingredient.measurement_unit}) \
-                — {ing.ingredient.amount}'''
-                for ing in in_obj
+        return super().get_queryset(request).prefetch_related(
+            Prefetch(
+                'recipe_ingredient',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
             )
         )
 
-        return safe_str
-
-    @admin.display(description="В избранном у")
-    def get_fav(self, obj):
+    @admin.display(description="Ингридиенты")
+    def get_ingredients(self, obj):
         """
-        Get count of haow may times
-        this recpie was add into Favorite.
+        Return safe-string with information of amount, MU and
+        name of the ingredient.
         """
 
-        return obj.fav.count()
+        return format_html_join(
+            '\n',
+            '{} ({}) — {}<br>',
+            (
+                (
+                    ing.ingredient.name,
+                    ing.ingredient.measurement_unit,
+                    ing.amount
+                )
+                for ing in obj.recipe_ingredient.all()
+            )
+        )
 
 
-@admin.register(ToBuyList)
-class ToBuyListAdmin(admin.ModelAdmin):
+class UserRecipeAdmin(ScalableAdmin):
     """
-    Class to add ToBuyList to admin.
+    Base admin for user-recipe relations.
     """
 
     list_display = (
@@ -128,16 +215,29 @@ class ToBuyListAdmin(admin.ModelAdmin):
         'user',
         'recipes'
     )
+    list_select_related = (
+        'user',
+        'recipes'
+    )
+    autocomplete_fields = (
+        'user',
+        'recipes'
+    )
+    search_fields = (
+        'user__username',
+        'recipes__name'
+    )
+
+
+@admin.register(ToBuyList)
+class ToBuyListAdmin(UserRecipeAdmin):
+    """
+    Class to add ToBuyList to admin.
+    """
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(UserRecipeAdmin):
     """
     Class to add Favorite to admin.
     """
-
-    list_display = (
-        'pk',
-        'user',
-        'recipes'
-    )
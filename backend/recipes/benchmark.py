@@ -0,0 +1,11 @@
+import math
+
+
+def percentile(values, share):
+    """
+    Nearest-rank percentile of sorted values.
+    """
+
+    if not values:
+        return None
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
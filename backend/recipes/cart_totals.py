@@ -0,0 +1,198 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from recipes.models import IngredientInRecipe, ToBuyList, ToBuyListTotal
+
+
+def recipe_amounts(recipe_id):
+    """
+    Return dict of ingredient id to amount for recipe.
+    """
+
+    return dict(
+        IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+def recipes_amounts(recipe_ids):
+    """
+    Return dict of ingredient id to amount summed over recipes.
+    """
+
+    return dict(
+        IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total').order_by()
+    )
+
+
+def amounts_delta(old_amounts, new_amounts):
+    """
+    Return per ingredient difference between
+    two amounts dicts skipping unchanged ingredients.
+    """
+
+    delta = {}
+    for ingredient_id in old_amounts.keys() | new_amounts.keys():
+        change = (
+            new_amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0)
+        )
+        if change:
+            delta[ingredient_id] = change
+    return delta
+
+
+@transaction.atomic
+def apply_delta(user_ids, delta):
+    """
+    Add delta amounts to totals of every user in user_ids.
+    Missing rows are created, rows dropping to zero are removed.
+    Amounts are changed with F() so concurrent calls stay consistent.
+    """
+
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+
+    ToBuyListTotal.objects.bulk_create(
+        (
+            ToBuyListTotal(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, change in delta.items()
+            if change > 0
+        ),
+        ignore_conflicts=True
+    )
+    totals = ToBuyListTotal.objects.filter(
+        user_id__in=user_ids,
+        ingredient_id__in=delta.keys()
+    )
+    # Totals that drifted below actual value are not
+    # decremented under zero, rebuild fixes them.
+    totals.update(
+        total=Greatest(
+            F('total') + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(change))
+                    for ingredient_id, change in delta.items()
+                ),
+                output_field=IntegerField()
+            ),
+            Value(0)
+        )
+    )
+    totals.filter(total__lte=0).delete()
+
+
+def add_recipe(user_id, recipe_id):
+    """
+    Account recipe added to user shopping cart.
+    """
+
+    apply_delta((user_id,), recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_ids, recipe_id):
+    """
+    Account recipe removed from shopping carts of users.
+    """
+
+    apply_delta(
+        user_ids,
+        amounts_delta(recipe_amounts(recipe_id), {})
+    )
+
+
+def add_recipes(user_id, recipe_ids):
+    """
+    Account several recipes added to user shopping cart.
+    """
+
+    apply_delta((user_id,), recipes_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    """
+    Account several recipes removed from user shopping cart.
+    """
+
+    apply_delta(
+        (user_id,),
+        amounts_delta(recipes_amounts(recipe_ids), {})
+    )
+
+
+def change_recipe(recipe_id, old_amounts, new_amounts):
+    """
+    Account changed ingredients of recipe
+    for every user having it in shopping cart.
+    """
+
+    apply_delta(
+        ToBuyList.objects.filter(
+            recipes_id=recipe_id
+        ).values_list('user_id', flat=True),
+        amounts_delta(old_amounts, new_amounts)
+    )
+
+
+def live_totals():
+    """
+    Queryset of totals aggregated from ToBuyList.
+    """
+
+    return ToBuyList.objects.values(
+        'user_id',
+        ingredient_id=F('recipes__recipe_ingredient__ingredient'),
+    ).annotate(
+        total=Sum('recipes__recipe_ingredient__amount')
+    ).filter(
+        ingredient_id__isnull=False
+    ).order_by()
+
+
+@transaction.atomic
+def rebuild(batch_size=None):
+    """
+    Replace all totals with live aggregate.
+    Return number of created rows.
+    """
+
+    ToBuyListTotal.objects.all().delete()
+    return len(ToBuyListTotal.objects.bulk_create(
+        (
+            ToBuyListTotal(**row)
+            for row in live_totals().iterator()
+        ),
+        batch_size=batch_size
+    ))
+
+
+def find_mismatches():
+    """
+    Return list of (user_id, ingredient_id, stored, live)
+    for totals differing from live aggregate.
+    """
+
+    live = {
+        (row['user_id'], row['ingredient_id']): row['total']
+        for row in live_totals().iterator()
+    }
+    stored = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total
+        in ToBuyListTotal.objects.values_list(
+            'user_id', 'ingredient_id', 'total'
+        ).iterator()
+    }
+    return [
+        (*key, stored.get(key), live.get(key))
+        for key in sorted(live.keys() | stored.keys())
+        if stored.get(key) != live.get(key)
+    ]
@@ -0,0 +1,83 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, SubPair, User
+from recipes.signals import favorites_count_changed
+
+
+def _changed(counter, delta):
+    # Counters that drifted below actual value are not
+    # decremented under zero, reconcile fixes them.
+    return Greatest(F(counter) + delta, Value(0))
+
+
+def change_favorites_count(recipe_ids, delta):
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        favorites_count=_changed('favorites_count', delta)
+    )
+    favorites_count_changed.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+def change_recipes_count(user_ids, delta):
+    User.objects.filter(pk__in=user_ids).update(
+        recipes_count=_changed('recipes_count', delta)
+    )
+
+
+def change_subscribers_count(user_ids, delta):
+    User.objects.filter(pk__in=user_ids).update(
+        subscribers_count=_changed('subscribers_count', delta)
+    )
+
+
+def _count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        Value(0)
+    )
+
+
+def _reconcile(queryset, counter, related, field):
+    actual = _count_subquery(related, field)
+    return queryset.annotate(
+        actual_count=actual
+    ).exclude(
+        **{counter: F('actual_count')}
+    ).update(**{counter: actual})
+
+
+def reconcile():
+    """
+    Fix counters differing from actual counts.
+    Return dict of counter name to number of fixed rows.
+    """
+
+    fixed = {
+        'favorites_count': _reconcile(
+            Recipe.objects.all(),
+            'favorites_count',
+            Favorite.objects.all(),
+            'recipes'
+        ),
+        'recipes_count': _reconcile(
+            User.objects.all(),
+            'recipes_count',
+            Recipe.objects.all(),
+            'author'
+        ),
+        'subscribers_count': _reconcile(
+            User.objects.all(),
+            'subscribers_count',
+            SubPair.objects.all(),
+            'content_maker'
+        ),
+    }
+    if fixed['favorites_count']:
+        favorites_count_changed.send(sender=Recipe, recipe_ids=None)
+    return fixed
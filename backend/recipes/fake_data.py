@@ -0,0 +1,378 @@
+import bisect
+import datetime
+import io
+import math
+import multiprocessing
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+import constant
+from recipes import cart_totals, counters
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            SubPair, ToBuyList, User)
+from recipes.search import update_search_vector
+
+
+@lru_cache(maxsize=None)
+def zipf_weights(size, exponent=constant.FAKE_ZIPF_EXPONENT):
+    """
+    Cumulative Zipf weights, item of rank 0 is the most popular.
+    """
+
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def pick(rng, cum_weights):
+    """
+    Return index picked with cumulative weights.
+    """
+
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def pick_many(rng, cum_weights, size, exclude=None):
+    """
+    Return sorted distinct indexes picked with cumulative weights.
+    Popular indexes are hit repeatedly, so number of attempts
+    is bounded and fewer indexes may be returned.
+    """
+
+    size = min(size, len(cum_weights) - (exclude is not None))
+    picked = set()
+    for _ in range(size * 10):
+        if len(picked) >= size:
+            break
+        index = pick(rng, cum_weights)
+        if index != exclude:
+            picked.add(index)
+    return sorted(picked)
+
+
+def skewed_count(rng, mean, limit):
+    """
+    Return lognormal count with given mean:
+    most rows get a few items, some get a lot.
+    """
+
+    if mean <= 0:
+        return 0
+    sigma = constant.FAKE_COUNT_SIGMA
+    count = rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+    return min(round(count), limit)
+
+
+def make_users(rng, start, stop, params):
+    prefix = params['prefix']
+    return [
+        User(
+            id=user_id,
+            username=f'{prefix}{user_id}',
+            email=f'{prefix}{user_id}@example.com',
+            first_name=f'Имя{user_id}',
+            last_name=f'Фамилия{user_id}',
+            password=params['password'],
+        )
+        for user_id in range(
+            params['user_base'] + start,
+            params['user_base'] + stop
+        )
+    ]
+
+
+def make_recipes(rng, start, stop, params):
+    authors = zipf_weights(params['users'])
+    today = timezone.localdate()
+    recipes = []
+    for number in range(start, stop):
+        recipe_id = params['recipe_base'] + number
+        recipes.append(Recipe(
+            id=recipe_id,
+            author_id=params['user_base'] + pick(rng, authors),
+            name=f'{params["prefix"]} рецепт {recipe_id}',
+            text=f'Описание рецепта {recipe_id}',
+            cooking_time=min(
+                max(round(rng.lognormvariate(3.4, 0.6)), 1),
+                constant.FAKE_COOKING_TIME_MAX
+            ),
+            image=constant.FAKE_IMAGE,
+            posting_time=today - datetime.timedelta(
+                days=rng.randrange(constant.FAKE_POSTING_DAYS)
+            ),
+        ))
+    return recipes
+
+
+def make_ingredients_in_recipe(rng, start, stop, params):
+    ingredient_ids = params['ingredient_ids']
+    popularity = zipf_weights(len(ingredient_ids))
+    return [
+        IngredientInRecipe(
+            recipe_id=params['recipe_base'] + number,
+            ingredient_id=ingredient_ids[index],
+            amount=rng.randint(1, constant.FAKE_AMOUNT_MAX),
+        )
+        for number in range(start, stop)
+        for index in pick_many(
+            rng,
+            popularity,
+            max(skewed_count(
+                rng,
+                params['ingredients_per_recipe'],
+                len(ingredient_ids)
+            ), 1)
+        )
+    ]
+
+
+def make_subscriptions(rng, start, stop, params):
+    authors = zipf_weights(params['users'])
+    user_base = params['user_base']
+    return [
+        SubPair(
+            subscriber_id=user_base + number,
+            content_maker_id=user_base + index,
+        )
+        for number in range(start, stop)
+        for index in pick_many(
+            rng,
+            authors,
+            skewed_count(rng, params['subscriptions'], params['users']),
+            exclude=number
+        )
+    ]
+
+
+def _make_user_recipes(model, mean):
+    def make(rng, start, stop, params):
+        popularity = zipf_weights(params['recipes'])
+        return [
+            model(
+                user_id=params['user_base'] + number,
+                recipes_id=params['recipe_base'] + index,
+            )
+            for number in range(start, stop)
+            for index in pick_many(
+                rng,
+                popularity,
+                skewed_count(rng, params[mean], params['recipes'])
+            )
+        ]
+    return make
+
+
+# Phases run one after another, chunks of a phase run in parallel.
+# Table maps to (model, generator, parameter with number of chunked rows).
+PHASES = (
+    {'users': (User, make_users, 'users')},
+    {'recipes': (Recipe, make_recipes, 'recipes')},
+    {
+        'ingredients_in_recipe': (
+            IngredientInRecipe,
+            make_ingredients_in_recipe,
+            'recipes'
+        ),
+        'subscriptions': (SubPair, make_subscriptions, 'users'),
+        'favorites': (
+            Favorite,
+            _make_user_recipes(Favorite, 'favorites'),
+            'users'
+        ),
+        'carts': (ToBuyList, _make_user_recipes(ToBuyList, 'carts'), 'users'),
+    },
+)
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace(
+        '\t', '\\t'
+    ).replace('\n', '\\n').replace('\r', '\\r')
+
+
+def write(model, objects, batch_size=constant.POPULATE_BATCH_SIZE):
+    """
+    Insert objects with COPY on PostgreSQL and batched
+    executemany elsewhere. Unlike bulk_create, explicitly
+    set values of auto_now_add fields are kept.
+    """
+
+    if not objects:
+        return 0
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and objects[0].pk is None)
+    ]
+    rows = [
+        [
+            field.get_db_prep_save(
+                field.pre_save(obj, add=True)
+                if getattr(obj, field.attname) is None
+                else getattr(obj, field.attname),
+                connection
+            )
+            for field in fields
+        ]
+        for obj in objects
+    ]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(field.column) for field in fields
+    )
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write('\t'.join(map(_copy_value, row)) + '\n')
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY {table} ({columns}) FROM STDIN',
+                buffer
+            )
+        else:
+            placeholders = ', '.join(['%s'] * len(fields))
+            sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[start:start + batch_size])
+    return len(rows)
+
+
+def chunks(phase, params, chunk_size):
+    """
+    Yield generate_chunk arguments covering every table of phase.
+    """
+
+    for name, (_, _, rows) in PHASES[phase].items():
+        for chunk, start in enumerate(range(0, params[rows], chunk_size)):
+            yield (
+                phase,
+                name,
+                chunk,
+                start,
+                min(start + chunk_size, params[rows]),
+                params
+            )
+
+
+def generate_chunk(phase, name, chunk, start, stop, params):
+    """
+    Generate and insert one chunk. Random state depends only
+    on seed, table and chunk number, so result does not
+    depend on number of workers. Runs in pool process.
+    """
+
+    model, make, _ = PHASES[phase][name]
+    rng = random.Random(f'{params["seed"]}:{name}:{chunk}')
+    with transaction.atomic():
+        return name, write(model, make(rng, start, stop, params))
+
+
+def fake_users():
+    return User.objects.filter(
+        username__startswith=constant.FAKE_PREFIX
+    ).order_by('pk')
+
+
+def next_id(model):
+    return (model.objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+
+
+def _no_progress(results, **kwargs):
+    return results
+
+
+def generate(users, recipes, ingredients, ingredients_per_recipe,
+             subscriptions, favorites, carts, seed=0, workers=1,
+             chunk_size=constant.FAKE_CHUNK_SIZE, progress=_no_progress):
+    """
+    Generate fake dataset and rebuild derived tables.
+    Chunks of every phase are passed through progress,
+    e.g. tqdm. Return Counter of inserted rows per table.
+    """
+
+    prefix = f'{constant.FAKE_PREFIX} {seed}'
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(
+                name=f'{prefix} ингредиент {number}',
+                measurement_unit=constant.FAKE_UNITS[
+                    number % len(constant.FAKE_UNITS)
+                ],
+            )
+            for number in range(ingredients)
+        ),
+        batch_size=constant.POPULATE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    params = {
+        'seed': seed,
+        'prefix': constant.FAKE_PREFIX,
+        'password': make_password(constant.FAKE_PASSWORD),
+        'user_base': next_id(User),
+        'recipe_base': next_id(Recipe),
+        'ingredient_ids': list(
+            Ingredient.objects.filter(
+                name__startswith=f'{prefix} ингредиент '
+            ).order_by('pk').values_list('pk', flat=True)
+        ),
+        'users': users,
+        'recipes': recipes,
+        'ingredients_per_recipe': ingredients_per_recipe,
+        'subscriptions': subscriptions,
+        'favorites': favorites,
+        'carts': carts,
+    }
+
+    if connection.vendor == 'sqlite':
+        workers = 1
+    created = Counter()
+    executor = None
+    if workers > 1:
+        # Forked workers inherit configured Django and
+        # open their own connections.
+        connections.close_all()
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('fork')
+        )
+    try:
+        for phase in range(len(PHASES)):
+            tasks = list(chunks(phase, params, chunk_size))
+            results = (
+                executor.map(generate_chunk, *zip(*tasks)) if executor
+                else (generate_chunk(*task) for task in tasks)
+            )
+            for name, rows in progress(
+                results,
+                total=len(tasks),
+                desc=f'Phase {phase + 1}'
+            ):
+                created[name] += rows
+    finally:
+        if executor:
+            executor.shutdown()
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+            no_style(),
+            [User, Recipe]
+        ):
+            cursor.execute(sql)
+    cart_totals.rebuild(constant.POPULATE_BATCH_SIZE)
+    counters.reconcile()
+    if connection.vendor == 'postgresql':
+        update_search_vector()
+    return created
@@ -0,0 +1,515 @@
+import base64
+import io
+import json
+import subprocess
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from django.urls import URLResolver, reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+import api.urls
+import constant
+from api.middleware import QueryStats
+from recipes import fake_data
+from recipes.benchmark import percentile
+from recipes.models import (Favorite, IngredientInRecipe, Recipe, SubPair,
+                            ToBuyList, User)
+
+# Routes of api/urls.py not measured, with reason.
+SKIPPED_ROUTES = {
+    ('users-activation', 'post'): 'e-mail flow',
+    ('users-resend-activation', 'post'): 'e-mail flow',
+    ('users-reset-password', 'post'): 'e-mail flow',
+    ('users-reset-password-confirm', 'post'): 'e-mail flow',
+    ('users-reset-username', 'post'): 'e-mail flow',
+    ('users-reset-username-confirm', 'post'): 'e-mail flow',
+    ('users-set-password', 'post'): 'changes benchmark credentials',
+    ('users-set-username', 'post'): 'changes benchmark credentials',
+    ('users-me', 'get'): 'path is served by users-get-me',
+    ('users-me', 'put'): 'path is served by users-get-me',
+    ('users-me', 'patch'): 'path is served by users-get-me',
+    ('users-me', 'delete'): 'path is served by users-get-me',
+    ('users-detail', 'put'): 'changes benchmark accounts',
+    ('users-detail', 'patch'): 'changes benchmark accounts',
+    ('users-detail', 'delete'): 'changes benchmark accounts',
+}
+
+
+class Step:
+    """
+    One measured request of a scenario.
+    """
+
+    def __init__(self, route, method, client, path, data=None,
+                 label=None):
+        self.route = route
+        self.method = method
+        self.client = client
+        self.path = path
+        self.data = data
+        self.label = label
+
+    @property
+    def key(self):
+        key = f'{self.method.upper()} {self.route}'
+        return f'{key} ({self.label})' if self.label else key
+
+
+def api_routes(patterns=api.urls.urlpatterns):
+    """
+    Yield (url name, method) of every route in api/urls.py.
+    """
+
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from api_routes(pattern.url_patterns)
+            continue
+        if pattern.name is None:
+            continue
+        view = pattern.callback
+        methods = getattr(view, 'actions', None) or [
+            method for method in view.view_class.http_method_names
+            if hasattr(view.view_class, method)
+        ]
+        for method in methods:
+            if method not in ('head', 'options'):
+                yield pattern.name, method
+
+
+class Command(BaseCommand):
+    """
+    Command to measure requests per second, latency percentiles
+    and query counts of every route in api/urls.py through the
+    full middleware stack. Dataset of generate_fake_data is seeded
+    into test database which is destroyed afterwards unless --keepdb.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--carts', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=constant.BENCHMARK_ITERATIONS
+        )
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Clear cache before every request.'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep test database and its dataset between runs.'
+        )
+        parser.add_argument('--output', help='Write results to json file.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            keepdb=options['keepdb']
+        )
+        try:
+            with override_settings(DEBUG=False):
+                report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name,
+                verbosity=0,
+                keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+
+        for key, result in report['results'].items():
+            self.stdout.write(
+                f'{key}: {result["rps"]} rps, '
+                f'p50 {result["p50_ms"]} ms, p99 {result["p99_ms"]} ms, '
+                f'{result["queries_max"]} queries'
+            )
+        for route, method in report['uncovered']:
+            self.stdout.write(
+                self.style.WARNING(f'Not measured: {method.upper()} {route}')
+            )
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
+
+    def run(self, options):
+        dataset = {
+            name: options[name]
+            for name in (
+                'users', 'recipes', 'ingredients', 'ingredients_per_recipe',
+                'subscriptions', 'favorites', 'carts',
+            )
+        }
+        if not fake_data.fake_users().exists():
+            fake_data.generate(seed=options['seed'], **dataset)
+        self.seed = options['seed']
+        self.prepare()
+
+        self.samples = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.cold = options['cold']
+        scenarios = [
+            getattr(self, name) for name in dir(self)
+            if name.startswith('scenario_')
+        ]
+        for scenario in scenarios:
+            for iteration in range(options['warmup']):
+                self.run_scenario(scenario, iteration, record=False)
+            for iteration in range(options['iterations']):
+                self.run_scenario(scenario, iteration)
+
+        measured = {key[:2] for key in self.samples}
+        return {
+            'commit': self.get_commit(),
+            'database': connection.vendor,
+            'dataset': {**dataset, 'seed': options['seed']},
+            'iterations': options['iterations'],
+            'cold_cache': self.cold,
+            'results': {
+                key[2]: self.summary(key)
+                for key in sorted(self.samples, key=lambda key: key[2])
+            },
+            'skipped': {
+                f'{method.upper()} {route}': reason
+                for (route, method), reason in SKIPPED_ROUTES.items()
+            },
+            'uncovered': sorted(
+                route for route in set(api_routes())
+                if route not in measured and route not in SKIPPED_ROUTES
+            ),
+        }
+
+    def summary(self, key):
+        samples = sorted(self.samples[key])
+        queries = self.queries[key]
+        return {
+            'requests': len(samples),
+            'rps': round(len(samples) / sum(samples), 1),
+            'p50_ms': round(percentile(samples, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+            'queries_min': min(queries),
+            'queries_max': max(queries),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'statuses': dict(sorted(self.statuses[key].items())),
+        }
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.run(
+                ('git', 'rev-parse', 'HEAD'),
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def run_scenario(self, scenario, iteration, record=True):
+        steps = scenario(iteration)
+        response = None
+        while True:
+            try:
+                step = steps.send(response)
+            except StopIteration:
+                return
+            response = self.perform(step, record)
+
+    def perform(self, step, record):
+        if self.cold:
+            cache.clear()
+        stats = QueryStats()
+        request = getattr(step.client, step.method)
+        kwargs = {}
+        if step.data is not None:
+            kwargs = {
+                'data': json.dumps(step.data),
+                'content_type': 'application/json',
+            }
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = request(step.path, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - started
+        if record:
+            key = (step.route, step.method, step.key)
+            self.samples[key].append(elapsed)
+            self.queries[key].append(stats.count)
+            self.statuses[key][response.status_code] += 1
+        return response
+
+    def prepare(self):
+        """
+        Pick users and objects requests are made with.
+        """
+
+        users = list(fake_data.fake_users()[:2])
+        self.user, self.other_user = users
+        self.anonymous = Client()
+        self.client = self.get_client(self.user)
+        admin = User.objects.filter(is_superuser=True).first()
+        if admin is None:
+            admin = User.objects.create_superuser(
+                email='benchmark-admin@example.com',
+                username='benchmark-admin',
+                password=constant.FAKE_PASSWORD,
+                first_name='Benchmark',
+                last_name='Admin',
+            )
+        self.admin = self.get_client(admin)
+
+        own = Recipe.objects.filter(author=self.user)
+        self.own_recipe = own.first() or Recipe.objects.create(
+            author=self.user,
+            name='benchmark',
+            text='benchmark',
+            cooking_time=1,
+            image=constant.FAKE_IMAGE,
+        )
+        self.own_ingredients = list(
+            IngredientInRecipe.objects.filter(
+                recipe=self.own_recipe
+            ).values_list('ingredient_id', flat=True)
+        ) or [IngredientInRecipe.objects.values_list(
+            'ingredient_id',
+            flat=True
+        ).first()]
+        free_recipes = Recipe.objects.exclude(
+            author=self.user
+        ).exclude(
+            favorites__user=self.user
+        ).exclude(
+            to_buy_lists__user=self.user
+        ).order_by('pk').values_list('pk', flat=True)
+        self.free_recipe, *self.free_recipes = free_recipes[:21]
+        self.recipe = Recipe.objects.exclude(author=self.user).first()
+        free_authors = fake_data.fake_users().exclude(
+            pk=self.user.pk
+        ).exclude(
+            pk__in=SubPair.objects.filter(
+                subscriber=self.user
+            ).values('content_maker')
+        ).values_list('pk', flat=True)
+        self.free_author, *self.free_authors = free_authors[:6]
+        self.favorited = Favorite.objects.filter(user=self.user).exists()
+        self.in_cart = ToBuyList.objects.filter(user=self.user).exists()
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), 'orange').save(buffer, 'PNG')
+        self.image = 'data:image/png;base64,' + base64.b64encode(
+            buffer.getvalue()
+        ).decode()
+
+    @staticmethod
+    def get_client(user):
+        token, _ = Token.objects.get_or_create(user=user)
+        return Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def recipe_payload(self, amount):
+        return {
+            'name': 'benchmark',
+            'text': 'benchmark',
+            'cooking_time': 10,
+            'image': self.image,
+            'ingredients': [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id in self.own_ingredients
+            ],
+        }
+
+    def scenario_users(self, iteration):
+        url = reverse('api:users-list')
+        yield Step('users-list', 'get', self.client, url)
+        yield Step(
+            'users-list',
+            'post',
+            self.anonymous,
+            url,
+            {
+                'email': f'benchmark-{uuid.uuid4().hex}@example.com',
+                'username': f'benchmark-{uuid.uuid4().hex}',
+                'first_name': 'Benchmark',
+                'last_name': 'User',
+                'password': constant.FAKE_PASSWORD,
+            }
+        )
+        url = reverse('api:users-detail', kwargs={'id': self.other_user.pk})
+        yield Step('users-detail', 'get', self.client, url)
+        yield Step('users-detail', 'get', self.anonymous, url, label='anon')
+        yield Step(
+            'users-get-me',
+            'get',
+            self.client,
+            reverse('api:users-get-me')
+        )
+
+    def scenario_avatar(self, iteration):
+        url = reverse('api:users-avatar')
+        yield Step('users-avatar', 'put', self.client, url, {
+            'avatar': self.image
+        })
+        yield Step('users-avatar', 'delete', self.client, url)
+
+    def scenario_subscriptions(self, iteration):
+        yield Step(
+            'users-subscriptions',
+            'get',
+            self.client,
+            reverse('api:users-subscriptions') + '?recipes_limit=3'
+        )
+        url = reverse(
+            'api:users-subscribe',
+            kwargs={'id': self.free_author}
+        )
+        yield Step('users-subscribe', 'post', self.client, url)
+        yield Step('users-subscribe', 'delete', self.client, url)
+        url = reverse('api:users-subscribe_batch')
+        data = {'ids': self.free_authors}
+        yield Step('users-subscribe_batch', 'post', self.client, url, data)
+        yield Step('users-subscribe_batch', 'delete', self.client, url, data)
+
+    def scenario_ingredients(self, iteration):
+        yield Step(
+            'ingredients-list',
+            'get',
+            self.anonymous,
+            reverse('api:ingredients-list')
+            + f'?name={constant.FAKE_PREFIX} {self.seed} ингредиент 1'
+        )
+        ingredient_id = self.own_ingredients[0]
+        yield Step(
+            'ingredients-detail',
+            'get',
+            self.anonymous,
+            reverse('api:ingredients-detail', kwargs={'pk': ingredient_id})
+        )
+
+    def scenario_recipes_read(self, iteration):
+        url = reverse('api:recipes-list')
+        offset = iteration % 10 * 6
+        yield Step(
+            'recipes-list', 'get', self.anonymous,
+            f'{url}?offset={offset}', label='anon'
+        )
+        yield Step(
+            'recipes-list', 'get', self.client, f'{url}?offset={offset}'
+        )
+        if self.favorited:
+            yield Step(
+                'recipes-list', 'get', self.client,
+                f'{url}?is_favorited=1', label='is_favorited'
+            )
+        yield Step(
+            'recipes-list', 'get', self.client,
+            f'{url}?author={self.other_user.pk}', label='author'
+        )
+        yield Step(
+            'recipes-list', 'get', self.client,
+            f'{url}?pagination=cursor', label='cursor'
+        )
+        url = reverse('api:recipes-detail', kwargs={'pk': self.recipe.pk})
+        yield Step('recipes-detail', 'get', self.client, url)
+        yield Step('recipes-detail', 'get', self.anonymous, url, label='anon')
+        yield Step(
+            'recipes-get-link',
+            'get',
+            self.client,
+            reverse('api:recipes-get-link', kwargs={'pk': self.recipe.pk})
+        )
+        if self.in_cart:
+            yield Step(
+                'recipes-download_shopping_cart',
+                'get',
+                self.client,
+                reverse('api:recipes-download_shopping_cart')
+            )
+        yield Step(
+            'recipes-cache_stats',
+            'get',
+            self.admin,
+            reverse('api:recipes-cache_stats')
+        )
+
+    def scenario_recipes_write(self, iteration):
+        url = reverse('api:recipes-detail', kwargs={'pk': self.own_recipe.pk})
+        yield Step(
+            'recipes-detail', 'patch', self.client, url,
+            {
+                key: value
+                for key, value in self.recipe_payload(
+                    iteration % 2 + 1
+                ).items()
+                if key != 'image'
+            }
+        )
+        yield Step(
+            'recipes-detail', 'put', self.client, url,
+            self.recipe_payload(iteration % 2 + 1)
+        )
+        response = yield Step(
+            'recipes-list',
+            'post',
+            self.client,
+            reverse('api:recipes-list'),
+            self.recipe_payload(1)
+        )
+        if response.status_code == 201:
+            yield Step(
+                'recipes-detail',
+                'delete',
+                self.client,
+                reverse(
+                    'api:recipes-detail',
+                    kwargs={'pk': response.json()['id']}
+                )
+            )
+
+    def scenario_recipe_collections(self, iteration):
+        for route in ('recipes-favorite', 'recipes-shopping_cart'):
+            url = reverse(f'api:{route}', kwargs={'pk': self.free_recipe})
+            yield Step(route, 'post', self.client, url)
+            yield Step(route, 'delete', self.client, url)
+        data = {'ids': self.free_recipes}
+        for route in ('recipes-favorite_batch', 'recipes-shopping_cart_batch'):
+            url = reverse(f'api:{route}')
+            yield Step(route, 'post', self.client, url, data)
+            yield Step(route, 'delete', self.client, url, data)
+
+    def scenario_auth(self, iteration):
+        response = yield Step('login', 'post', self.anonymous, reverse(
+            'api:login'
+        ), {
+            'email': self.other_user.email,
+            'password': constant.FAKE_PASSWORD,
+        })
+        token = response.json().get('auth_token')
+        yield Step(
+            'logout',
+            'post',
+            Client(HTTP_AUTHORIZATION=f'Token {token}'),
+            reverse('api:logout')
+        )
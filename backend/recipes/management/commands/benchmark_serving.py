@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+import constant
+from recipes.benchmark import percentile
+
+
+class Command(BaseCommand):
+    """
+    Command to compare throughput and latency of running
+    servers, e.g. WSGI and ASGI deployments started
+    with equal worker counts:
+
+    benchmark_serving --target wsgi=http://localhost:8000
+    --target asgi=http://localhost:8001
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            required=True,
+            help='name=base_url of server to benchmark.'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Requested path, endpoints of async views by default.'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=constant.BENCHMARK_REQUESTS,
+            help='Requests per path.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=constant.BENCHMARK_CONCURRENCY
+        )
+        parser.add_argument(
+            '--token',
+            help='Auth token, paths needing auth are skipped without it.'
+        )
+        parser.add_argument('--output', help='Write results to json file.')
+
+    def run_path(self, url, headers, options):
+        local = threading.local()
+
+        def request(_):
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+            started = time.perf_counter()
+            try:
+                ok = session.get(
+                    url,
+                    headers=headers,
+                    timeout=constant.BENCHMARK_TIMEOUT
+                ).status_code < 400
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            list(executor.map(request, range(options['concurrency'])))
+            started = time.perf_counter()
+            results = list(executor.map(request, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in results)
+        return {
+            'requests': len(results),
+            'errors': sum(not ok for _, ok in results),
+            'seconds': round(elapsed, 3),
+            'rps': round(len(results) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        }
+
+    def handle(self, *args, **options):
+        try:
+            targets = dict(
+                target.split('=', 1) for target in options['target']
+            )
+        except ValueError:
+            raise CommandError('Target should be name=base_url')
+        paths = options['path'] or constant.BENCHMARK_PATHS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        else:
+            paths = [path for path in paths if '/users/' not in path]
+
+        results = {}
+        for name, base_url in targets.items():
+            results[name] = {}
+            for path in paths:
+                result = self.run_path(
+                    base_url.rstrip('/') + path,
+                    headers,
+                    options
+                )
+                results[name][path] = result
+                self.stdout.write(
+                    f'{name} {path}: {result["rps"]} rps, '
+                    f'p50 {result["p50_ms"]} ms, '
+                    f'p99 {result["p99_ms"]} ms, '
+                    f'{result["errors"]} errors'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(
+                    {
+                        'concurrency': options['concurrency'],
+                        'results': results,
+                    },
+                    file,
+                    indent=2
+                )
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
@@ -0,0 +1,114 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+import constant
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            SubPair, ToBuyList, ToBuyListTotal, User)
+
+
+def seq_scans(plan):
+    """
+    Yield relation names of sequential scans in EXPLAIN json plan.
+    """
+
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan['Relation Name']
+    for child in plan.get('Plans', ()):
+        yield from seq_scans(child)
+
+
+def key_queries():
+    """
+    Return dict of name to queryset of queries API relies on.
+    """
+
+    user_id = User.objects.values_list('pk', flat=True).first() or 1
+    recipe_id = Recipe.objects.values_list('pk', flat=True).first() or 1
+    page = settings.REST_FRAMEWORK['PAGE_SIZE']
+    ordering = ('-posting_time', '-id')
+    return {
+        'recipes page': Recipe.objects.order_by(*ordering)[:page],
+        'recipes of author': Recipe.objects.filter(
+            author_id=user_id
+        ).order_by(*ordering)[:page],
+        'favorited recipes': Recipe.objects.filter(
+            favorites__user_id=user_id
+        ).order_by(*ordering)[:page],
+        'recipes in shopping cart': Recipe.objects.filter(
+            to_buy_lists__user_id=user_id
+        ).order_by(*ordering)[:page],
+        'favorites of recipe': Favorite.objects.filter(recipes_id=recipe_id),
+        'carts with recipe': ToBuyList.objects.filter(recipes_id=recipe_id),
+        'subscriptions of user': SubPair.objects.filter(
+            subscriber_id=user_id
+        ),
+        'subscribers of author': SubPair.objects.filter(
+            content_maker_id=user_id
+        ),
+        'ingredients of recipe': IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id
+        ),
+        'ingredient name prefix': Ingredient.objects.filter(
+            name__istartswith='са'
+        ),
+        'shopping cart totals': ToBuyListTotal.objects.filter(
+            user_id=user_id
+        ),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Command to check that key queries are served by indexes.
+    By default sequential scans are disabled, so any remaining
+    one means there is no usable index. With --at-scale planner
+    runs with defaults and only sequential scans of tables
+    bigger than QUERY_PLAN_SEQ_SCAN_ROWS fail, which is meant
+    for databases filled with generate_fake_data.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--at-scale',
+            action='store_true',
+            help='Keep planner defaults and skip small tables.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans are checked on PostgreSQL only')
+
+        failed = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if options['at_scale']:
+                    cursor.execute(
+                        'SELECT relname FROM pg_class WHERE reltuples >= %s',
+                        [constant.QUERY_PLAN_SEQ_SCAN_ROWS]
+                    )
+                    big_tables = {row[0] for row in cursor.fetchall()}
+                else:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in key_queries().items():
+                plan = json.loads(queryset.explain(format='json'))
+                scanned = sorted(
+                    table for table in set(seq_scans(plan[0]['Plan']))
+                    if not options['at_scale'] or table in big_tables
+                )
+                if scanned:
+                    failed.append(name)
+                    self.stdout.write(self.style.ERROR(
+                        f'{name}: sequential scan of {", ".join(scanned)}'
+                    ))
+                else:
+                    self.stdout.write(f'{name}: OK')
+
+        if failed:
+            raise CommandError(
+                f'Queries without index: {len(failed)}'
+            )
+        self.stdout.write(self.style.SUCCESS('All key queries use indexes'))
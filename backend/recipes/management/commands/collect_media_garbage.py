@@ -0,0 +1,72 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+import constant
+from recipes.models import Recipe, User
+from recipes.storage import (CONTENT_NAME_REGEX, content_storage,
+                             variant_name)
+
+
+class Command(BaseCommand):
+    """
+    Command to delete content addressed images
+    not referenced by any recipe or user.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=constant.MEDIA_GC_GRACE_SECONDS,
+            help='Keep files modified less than grace seconds ago.'
+        )
+
+    def stored_names(self, root):
+        """
+        Yield names of content addressed files under root.
+        """
+
+        if not content_storage.exists(root):
+            return
+        for prefix in content_storage.listdir(root)[0]:
+            directory = os.path.join(root, prefix)
+            for file_name in content_storage.listdir(directory)[1]:
+                if CONTENT_NAME_REGEX.match(file_name):
+                    yield os.path.join(directory, file_name)
+
+    def handle(self, *args, **options):
+        referenced = set(
+            Recipe.objects.values_list('image', flat=True).iterator()
+        ) | set(
+            User.objects.exclude(avatar='').values_list(
+                'avatar',
+                flat=True
+            ).iterator()
+        )
+        deadline = time.time() - options['grace']
+        removed = freed = 0
+        for root in (
+            constant.RECIPE_IMAGE_UPLOAD_TO,
+            constant.AVATAR_UPLOAD_TO
+        ):
+            for name in self.stored_names(root):
+                path = content_storage.path(name)
+                if name in referenced or os.path.getmtime(path) > deadline:
+                    continue
+                removed += 1
+                freed += os.path.getsize(path)
+                if options['dry_run']:
+                    continue
+                content_storage.purge(name)
+                for variant in constant.IMAGE_VARIANTS:
+                    content_storage.purge(variant_name(name, variant))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{"Would remove" if options["dry_run"] else "Removed"}'
+                f' files: {removed}, bytes: {freed}'
+            )
+        )
@@ -0,0 +1,79 @@
+import os
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from tqdm import tqdm
+
+import constant
+from recipes import fake_data
+
+
+class Command(BaseCommand):
+    """
+    Command to generate production-scale fake dataset.
+    Authors, ingredients and recipes popularity follow Zipf law,
+    numbers of subscriptions, favorites and cart items per user
+    and ingredients per recipe are lognormal. Result is
+    deterministic for a seed and an initial database state,
+    whatever number of workers is used.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=float,
+            default=8,
+            help='Mean number of ingredients per recipe.'
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=float,
+            default=20,
+            help='Mean number of subscriptions per user.'
+        )
+        parser.add_argument(
+            '--favorites',
+            type=float,
+            default=30,
+            help='Mean number of favorite recipes per user.'
+        )
+        parser.add_argument(
+            '--carts',
+            type=float,
+            default=10,
+            help='Mean number of recipes in shopping cart per user.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Worker processes, SQLite always uses one.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=constant.FAKE_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        if options['recipes'] and not options['users']:
+            raise CommandError('Recipes can not be generated without users')
+        created = fake_data.generate(
+            **{
+                name: options[name]
+                for name in (
+                    'users', 'recipes', 'ingredients',
+                    'ingredients_per_recipe', 'subscriptions', 'favorites',
+                    'carts', 'seed', 'workers', 'chunk_size',
+                )
+            },
+            progress=partial(tqdm, unit='chunk')
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Generated '
+            + ', '.join(f'{name}: {rows}' for name, rows in created.items())
+        ))
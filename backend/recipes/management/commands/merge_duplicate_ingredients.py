@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from recipes import cart_totals
+from recipes.models import Ingredient, IngredientInRecipe, ToBuyListTotal
+from recipes.signals import ingredients_changed
+
+
+class Command(BaseCommand):
+    """
+    Command to merge ingredients with equal name and measurement
+    unit, run before migration adding their unique constraint.
+    Ingredients of recipes are moved to the oldest duplicate,
+    amounts of the same recipe are summed.
+    """
+
+    def handle(self, *args, **options):
+        tables = connection.introspection.table_names()
+        if Ingredient._meta.db_table not in tables:
+            self.stdout.write('No ingredients to merge')
+            return
+
+        with transaction.atomic():
+            kept_of = {}
+            first = {}
+            for pk, name, unit in Ingredient.objects.order_by(
+                'pk'
+            ).values_list('pk', 'name', 'measurement_unit').iterator():
+                kept = first.setdefault((name, unit), pk)
+                if kept != pk:
+                    kept_of[pk] = kept
+            if not kept_of:
+                self.stdout.write('No ingredients to merge')
+                return
+
+            rows = defaultdict(list)
+            for row in IngredientInRecipe.objects.filter(
+                ingredient_id__in=kept_of.keys() | set(kept_of.values())
+            ).order_by('pk'):
+                rows[
+                    row.recipe_id,
+                    kept_of.get(row.ingredient_id, row.ingredient_id)
+                ].append(row)
+            merged = []
+            removed = []
+            for (_, kept), recipe_rows in rows.items():
+                target = next(
+                    (row for row in recipe_rows if row.ingredient_id == kept),
+                    recipe_rows[0]
+                )
+                if len(recipe_rows) == 1 and target.ingredient_id == kept:
+                    continue
+                target.amount = sum(row.amount for row in recipe_rows)
+                target.ingredient_id = kept
+                merged.append(target)
+                removed.extend(
+                    row.pk for row in recipe_rows if row is not target
+                )
+
+            # Raw deletes send no signals and do not collect related
+            # tables, which may not be migrated yet.
+            IngredientInRecipe.objects.filter(
+                pk__in=removed
+            )._raw_delete(connection.alias)
+            IngredientInRecipe.objects.bulk_update(
+                merged,
+                ('ingredient', 'amount')
+            )
+            if ToBuyListTotal._meta.db_table in tables:
+                cart_totals.rebuild()
+            Ingredient.objects.filter(
+                pk__in=kept_of
+            )._raw_delete(connection.alias)
+
+        ingredients_changed.send(sender=self.__class__)
+        self.stdout.write(self.style.SUCCESS(
+            f'Merged ingredients: {len(kept_of)}, '
+            f'recipe ingredients: {len(merged)}'
+        ))
@@ -1,39 +1,176 @@
+import csv
+import hashlib
 import json
+from itertools import islice
+from pathlib import Path
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from tqdm import tqdm
 
 import constant
-from recipes.models import Ingredient
+from recipes.models import Ingredient, IngredientImport
+from recipes.signals import ingredients_changed
+
+
+def file_hash(path):
+    """
+    Return sha256 of file content read by chunks.
+    """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(
+            lambda: file.read(constant.POPULATE_READ_CHUNK),
+            b''
+        ):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_file(file_name):
+    """
+    Return path of file given as is or found in data directories.
+    """
+
+    for directory in (
+        Path(),
+        settings.BASE_DIR / constant.DATA_COPY_PATH,
+        settings.BASE_DIR.parent / constant.DATA_PATH,
+    ):
+        if (directory / file_name).is_file():
+            return directory / file_name
+    raise FileNotFoundError(f'{file_name} is not found')
+
+
+def iter_json_array(file):
+    """
+    Yield objects of top-level json array
+    without loading the whole file.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            if buffer[position] == ',' and not started:
+                raise ValueError('Json array expected')
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('Json array expected')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                continue
+        if eof:
+            raise ValueError('Unexpected end of file')
+        chunk = file.read(constant.POPULATE_READ_CHUNK)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_rows(file, path):
+    """
+    Yield (name, measurement_unit) pairs from json or csv file.
+    """
+
+    if path.suffix == '.csv':
+        for row in csv.reader(file):
+            yield tuple(row[:2]) if len(row) >= 2 else (None, None)
+        return
+    for ingredient in iter_json_array(file):
+        yield ingredient.get('name'), ingredient.get('measurement_unit')
 
 
 class Command(BaseCommand):
     """
-    Command to unpack initial ingridents from json_file.
+    Command to bulk load ingredients from json or csv file.
+    Existing ingredients are kept, repeated import
+    of the same file is skipped by its content hash.
     """
     def add_arguments(self, parser):
-        parser.add_argument('json_file', type=str)
+        parser.add_argument(
+            'file',
+            type=str,
+            help=(
+                f'Path or name of file in {constant.DATA_COPY_PATH} '
+                f'or ../{constant.DATA_PATH} directory.'
+            )
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=constant.POPULATE_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Import file even if it was imported before.'
+        )
 
     def handle(self, *args, **options):
-        file_name = options['json_file']
+        file_name = options['file']
         try:
-            path = settings.BASE_DIR / constant.DATA_COPY_PATH / file_name
-            with open(path, encoding='utf-8') as file:
-                ingredients = json.load(file)
-                for ingredient in tqdm(
-                    ingredients,
+            path = find_file(file_name)
+            digest = file_hash(path)
+            if (
+                not options['force']
+                and IngredientImport.objects.filter(
+                    file_hash=digest
+                ).exists()
+            ):
+                self.stdout.write(
+                    f'File named {file_name} was already imported'
+                )
+                return
+
+            with transaction.atomic(), open(path, encoding='utf-8') as file:
+                count_before = Ingredient.objects.count()
+                rows = skipped = 0
+                ingredients = tqdm(
+                    iter_rows(file, path),
                     desc="Adding ingredients",
                     unit="ingredient"
+                )
+                while batch := list(
+                    islice(ingredients, options['batch_size'])
                 ):
-                    Ingredient.objects.create(
-                        name=ingredient.get('name'),
-                        measurement_unit=ingredient.get('measurement_unit'),
+                    rows += len(batch)
+                    valid = [
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in batch
+                        if name and unit
+                    ]
+                    skipped += len(batch) - len(valid)
+                    Ingredient.objects.bulk_create(
+                        valid,
+                        ignore_conflicts=True
                     )
+                inserted = Ingredient.objects.count() - count_before
+                IngredientImport.objects.update_or_create(file_hash=digest)
 
+            ingredients_changed.send(sender=self.__class__)
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'File named {file_name} has: {len(ingredients)}'
+                    f'File named {file_name} has: {rows}, '
+                    f'inserted: {inserted}, '
+                    f'unchanged: {rows - inserted - skipped}, '
+                    f'skipped: {skipped}'
                 ))
 
         except Exception as e:
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import cart_totals
+
+
+class Command(BaseCommand):
+    """
+    Command to rebuild shopping cart totals table
+    and verify it against live aggregate.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only verify totals without rebuilding them.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            created = cart_totals.rebuild(options['batch_size'])
+            self.stdout.write(f'Rebuilt totals: {created} rows')
+
+        mismatches = cart_totals.find_mismatches()
+        for user_id, ingredient_id, stored, live in mismatches[:20]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'user={user_id} ingredient={ingredient_id}: '
+                    f'stored {stored}, live {live}'
+                )
+            )
+        if mismatches:
+            raise CommandError(
+                f'Totals differ from live aggregate: {len(mismatches)}'
+            )
+        self.stdout.write(self.style.SUCCESS('Totals are consistent'))
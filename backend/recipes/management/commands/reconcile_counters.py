@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import reconcile
+
+
+class Command(BaseCommand):
+    """
+    Command to fix drift of denormalized counters.
+    """
+
+    def handle(self, *args, **options):
+        for counter, fixed in reconcile().items():
+            self.stdout.write(
+                self.style.SUCCESS(f'{counter}: fixed {fixed} rows')
+            )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import update_search_vector
+
+
+class Command(BaseCommand):
+    """
+    Command to recalculate full-text search vectors of all recipes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only fill recipes without search vector.'
+        )
+
+    def handle(self, *args, **options):
+        updated = update_search_vector(
+            Recipe.objects.filter(
+                search_vector__isnull=True
+            ).values('pk') if options['missing'] else None
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Search vectors updated: {updated}')
+        )
@@ -1,15 +1,40 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.db.models.functions import Upper
 
 import constant
+from recipes.storage import get_content_storage
 
 
-class User(AbstractUser):
+class DenormalizedFieldsMixin:
+    """
+    Mixin leaving fields maintained by queryset updates out of
+    saves of existing rows, so stale in-memory values
+    do not overwrite concurrent F() changes.
+    """
+
+    denormalized_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(DenormalizedFieldsMixin, AbstractUser):
     """
     User model made from AbstructUser class.
     """
 
+    denormalized_fields = ('recipes_count', 'subscribers_count')
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
@@ -38,9 +63,20 @@ class User(AbstractUser):
     )
     avatar = models.ImageField(
         blank=True,
-        upload_to='media/avatars/',
+        upload_to=constant.AVATAR_UPLOAD_TO,
+        storage=get_content_storage,
         verbose_name='Изображение профиля'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -61,7 +97,8 @@ class SubPair(models.Model):
     subscriber = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='subscribers'
+        related_name='subscribers',
+        db_index=False
     )
     content_maker = models.ForeignKey(
         User,
@@ -100,21 +137,61 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='Unique_Ingredient'
+            )
+        ]
+        indexes = [
+            models.Index(
+                OpClass(Upper('name'), name='text_pattern_ops'),
+                name='ingredient_name_upper_idx'
+            )
+        ]
 
     def __str__(self) -> str:
         return f'{self.name} ({self.measurement_unit})'
 
 
-class Recipe(models.Model):
+class IngredientImport(models.Model):
+    """
+    Content hash of imported ingredients file
+    used to skip repeated imports.
+    """
+
+    file_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='Хеш файла'
+    )
+    imported_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата импорта'
+    )
+
+    class Meta:
+        verbose_name = 'Импорт ингредиентов'
+        verbose_name_plural = 'Импорты ингредиентов'
+
+    def __str__(self) -> str:
+        return f'{self.file_hash} ({self.imported_at})'
+
+
+class Recipe(DenormalizedFieldsMixin, models.Model):
     """
     Model of Recipe.
     """
 
+    denormalized_fields = ('favorites_count', 'search_vector')
+
     name = models.CharField(
         max_length=constant.RECIPE_MAX_NAME,
         verbose_name='Название'
     )
     image = models.ImageField(
+        upload_to=constant.RECIPE_IMAGE_UPLOAD_TO,
+        storage=get_content_storage,
         verbose_name='Картинка'
     )
     text = models.TextField(
@@ -135,6 +212,7 @@ class Recipe(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Автор рецепта'
     )
     ingredients = models.ManyToManyField(
@@ -146,17 +224,86 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном у'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
 
     class Meta:
         default_related_name = 'recipes'
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-posting_time',)
+        indexes = [
+            models.Index(
+                fields=('-posting_time', '-id'),
+                name='recipe_posting_time_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-posting_time', '-id'),
+                name='recipe_author_posting_time_idx'
+            ),
+            GinIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_gin'
+            )
+        ]
 
     def __str__(self) -> str:
         return str(self.name)
 
 
+class ShortLink(models.Model):
+    """
+    Model of compact base62 code of Recipe used in short links.
+    Code is derived from recipe id so it is generated once
+    and never collides.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_link',
+        verbose_name='Рецепт'
+    )
+    code = models.CharField(
+        max_length=constant.SHORT_LINK_MAX_LENGTH,
+        unique=True,
+        verbose_name='Код'
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self) -> str:
+        return f'{self.code} -> {self.recipe_id}'
+
+    @staticmethod
+    def code_for(recipe_id):
+        """
+        Encode recipe id in base62.
+        """
+
+        alphabet = constant.SHORT_LINK_ALPHABET
+        code = ''
+        while True:
+            recipe_id, digit = divmod(recipe_id, len(alphabet))
+            code = alphabet[digit] + code
+            if not recipe_id:
+                return code
+
+
 class IngredientInRecipe(models.Model):
     """
     Model for storing 'amount' value of Ingredient object In Recipe object.
@@ -166,6 +313,7 @@ class IngredientInRecipe(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='recipe_ingredient',
+        db_index=False,
         verbose_name='Рецепт'
     )
     ingredient = models.ForeignKey(
@@ -208,11 +356,13 @@ class AbstractUserRecipe(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Пользователь'
     )
     recipes = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Рецепт'
     )
 
@@ -224,6 +374,12 @@ class AbstractUserRecipe(models.Model):
                 name='Unique_%(class)s'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('recipes', 'user'),
+                name='%(class)s_recipes_user_idx'
+            )
+        ]
 
 
 class ToBuyList(AbstractUserRecipe):
@@ -252,3 +408,39 @@ class Favorite(AbstractUserRecipe):
 
     def __str__(self) -> str:
         return f'{self.user} нравится {self.recipes}'
+
+
+class ToBuyListTotal(models.Model):
+    """
+    Denormalized total amount of ingredient in user shopping cart.
+    Maintained incrementally by recipes.cart_totals functions.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингридиент'
+    )
+    total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        default_related_name = 'to_buy_list_totals'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='Unique_ToBuyListTotal'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.ingredient} x{self.total}'
@@ -0,0 +1,234 @@
+from collections import Counter, defaultdict
+
+from django.db.models import QuerySet
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes import cart_totals, counters
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            SubPair, ToBuyList)
+from recipes.search import update_search_vector
+
+# Fields whose values before save are needed to account changes.
+TRACKED_FIELDS = {
+    ToBuyList: ('user_id', 'recipes_id'),
+    IngredientInRecipe: ('recipe_id', 'ingredient_id', 'amount'),
+    Favorite: ('recipes_id',),
+    SubPair: ('content_maker_id',),
+    Recipe: ('author_id',),
+    Ingredient: ('name', 'measurement_unit'),
+}
+
+# Model to (counter change function, counted field).
+COUNTED = {
+    Favorite: (counters.change_favorites_count, 'recipes_id'),
+    SubPair: (counters.change_subscribers_count, 'content_maker_id'),
+    Recipe: (counters.change_recipes_count, 'author_id'),
+}
+
+REMOVED_CARTS = '_removed_carts'
+REMOVED_INGREDIENTS = '_removed_ingredients'
+REMOVED_COUNTED = '_removed_counted'
+
+
+def _model_of(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def _collect(origin, key, item):
+    """
+    Remember row deleted by origin deletion. Rows are
+    accounted once per deletion instead of once per row.
+    """
+
+    origin.__dict__.setdefault(key, []).append(item)
+
+
+def _pop(origin, key):
+    return origin.__dict__.pop(key, [])
+
+
+def _group(pairs):
+    groups = defaultdict(list)
+    for key, value in pairs:
+        groups[key].append(value)
+    return groups
+
+
+@receiver(pre_save, sender=ToBuyList)
+@receiver(pre_save, sender=IngredientInRecipe)
+@receiver(pre_save, sender=Favorite)
+@receiver(pre_save, sender=SubPair)
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=Ingredient)
+def remember_previous(sender, instance, **kwargs):
+    """
+    Keep tracked values of changed row before save.
+    """
+
+    instance._previous = None
+    if not instance._state.adding:
+        instance._previous = sender.objects.filter(
+            pk=instance.pk
+        ).values(*TRACKED_FIELDS[sender]).first()
+
+
+@receiver(post_save, sender=ToBuyList)
+def add_cart_totals(instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    current = {
+        'user_id': instance.user_id,
+        'recipes_id': instance.recipes_id,
+    }
+    if previous == current:
+        return
+    if previous:
+        cart_totals.remove_recipe(
+            (previous['user_id'],),
+            previous['recipes_id']
+        )
+    cart_totals.add_recipe(instance.user_id, instance.recipes_id)
+
+
+@receiver(pre_delete, sender=ToBuyList)
+def collect_removed_cart(instance, origin, **kwargs):
+    _collect(origin, REMOVED_CARTS, (instance.user_id, instance.recipes_id))
+
+
+@receiver(pre_delete, sender=Recipe)
+@receiver(post_delete, sender=ToBuyList)
+def remove_cart_totals(origin, **kwargs):
+    """
+    Account removed shopping cart rows. When recipes are
+    deleted with them, it runs in pre_delete of first recipe,
+    while recipe ingredients still exist.
+    """
+
+    pairs = _pop(origin, REMOVED_CARTS)
+    by_user = _group(pairs)
+    by_recipe = _group((recipe_id, user_id) for user_id, recipe_id in pairs)
+    if len(by_user) <= len(by_recipe):
+        for user_id, recipe_ids in by_user.items():
+            cart_totals.remove_recipes(user_id, recipe_ids)
+    else:
+        for recipe_id, user_ids in by_recipe.items():
+            cart_totals.remove_recipe(user_ids, recipe_id)
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def change_cart_totals(instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    old_amounts = {}
+    if previous and previous['recipe_id'] == instance.recipe_id:
+        old_amounts = {previous['ingredient_id']: previous['amount']}
+    elif previous:
+        cart_totals.change_recipe(
+            previous['recipe_id'],
+            {previous['ingredient_id']: previous['amount']},
+            {}
+        )
+    cart_totals.change_recipe(
+        instance.recipe_id,
+        old_amounts,
+        {instance.ingredient_id: instance.amount}
+    )
+    recipe_ids = {instance.recipe_id}
+    if previous:
+        recipe_ids.add(previous['recipe_id'])
+    if not previous or (
+        previous['recipe_id'], previous['ingredient_id']
+    ) != (instance.recipe_id, instance.ingredient_id):
+        update_search_vector(recipe_ids)
+
+
+@receiver(pre_delete, sender=IngredientInRecipe)
+def collect_removed_ingredient(instance, origin, **kwargs):
+    # Recipes deleted with their ingredients are
+    # accounted by removed shopping cart rows.
+    if _model_of(origin) in (IngredientInRecipe, Ingredient):
+        _collect(
+            origin,
+            REMOVED_INGREDIENTS,
+            (instance.recipe_id, (instance.ingredient_id, instance.amount))
+        )
+
+
+@receiver(post_delete, sender=IngredientInRecipe)
+def remove_ingredients(origin, **kwargs):
+    """
+    Account removed ingredients in shopping cart
+    totals and search vectors of their recipes.
+    """
+
+    removed = _group(_pop(origin, REMOVED_INGREDIENTS))
+    for recipe_id, amounts in removed.items():
+        cart_totals.change_recipe(recipe_id, dict(amounts), {})
+    if removed:
+        update_search_vector(removed.keys())
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(instance, **kwargs):
+    update_search_vector({instance.pk})
+
+
+@receiver(post_save, sender=Ingredient)
+def rename_ingredient(instance, **kwargs):
+    """
+    Mark recipes with changed ingredient as modified,
+    so their ETags change, and update their search vectors.
+    """
+
+    previous = getattr(instance, '_previous', None)
+    if not previous or previous == {
+        'name': instance.name,
+        'measurement_unit': instance.measurement_unit,
+    }:
+        return
+    recipes = Recipe.objects.filter(
+        pk__in=IngredientInRecipe.objects.filter(
+            ingredient=instance
+        ).values('recipe_id')
+    )
+    recipes.update(updated_at=timezone.now())
+    if previous['name'] != instance.name:
+        update_search_vector(recipes.values('pk'))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=SubPair)
+@receiver(post_save, sender=Recipe)
+def increment_counter(sender, instance, **kwargs):
+    change, field = COUNTED[sender]
+    previous = getattr(instance, '_previous', None)
+    current = getattr(instance, field)
+    if previous is not None:
+        if previous[field] == current:
+            return
+        change((previous[field],), -1)
+    change((current,), 1)
+
+
+@receiver(pre_delete, sender=Favorite)
+@receiver(pre_delete, sender=SubPair)
+@receiver(pre_delete, sender=Recipe)
+def collect_counted(sender, instance, origin, **kwargs):
+    _collect(
+        origin,
+        f'{REMOVED_COUNTED}_{sender.__name__}',
+        getattr(instance, COUNTED[sender][1])
+    )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=SubPair)
+@receiver(post_delete, sender=Recipe)
+def decrement_counter(sender, origin, **kwargs):
+    change, _ = COUNTED[sender]
+    removed = Counter(_pop(origin, f'{REMOVED_COUNTED}_{sender.__name__}'))
+    for count, ids in _group(
+        (count, pk) for pk, count in removed.items()
+    ).items():
+        change(ids, -count)
@@ -0,0 +1,67 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+import constant
+from recipes.models import IngredientInRecipe, Recipe
+
+
+def update_search_vector(recipe_ids=None):
+    """
+    Recalculate search_vector of recipes from name, text
+    and ingredient names. All recipes are updated
+    when recipe_ids is None.
+    """
+
+    ingredient_names = IngredientInRecipe.objects.filter(
+        recipe=OuterRef('pk')
+    ).values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+
+    return recipes.update(
+        search_vector=(
+            SearchVector(
+                'name',
+                weight='A',
+                config=constant.RECIPE_SEARCH_CONFIG
+            )
+            + SearchVector(
+                Coalesce(
+                    Subquery(ingredient_names),
+                    Value(''),
+                    output_field=TextField()
+                ),
+                weight='B',
+                config=constant.RECIPE_SEARCH_CONFIG
+            )
+            + SearchVector(
+                'text',
+                weight='C',
+                config=constant.RECIPE_SEARCH_CONFIG
+            )
+        )
+    )
+
+
+def search_recipes(queryset, value):
+    """
+    Filter queryset by full-text query ordering by rank.
+    """
+
+    query = SearchQuery(
+        value,
+        config=constant.RECIPE_SEARCH_CONFIG,
+        search_type='websearch'
+    )
+    return queryset.filter(
+        search_vector=query
+    ).annotate(
+        search_rank=SearchRank(F('search_vector'), query)
+    ).order_by('-search_rank', '-posting_time')
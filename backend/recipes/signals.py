@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+# Sent after ingredients were changed in bulk,
+# bypassing model save/delete signals.
+ingredients_changed = Signal()
+
+# Sent after favorites_count of recipes was updated in bulk.
+favorites_count_changed = Signal()
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+import constant
+
+CONTENT_NAME_REGEX = re.compile(r'^[0-9a-f]{64}(\.\w+)?$')
+
+
+def variant_name(name, variant):
+    """
+    Return storage name of image variant.
+    """
+
+    return os.path.join(
+        constant.IMAGE_VARIANTS_DIR,
+        f'{os.path.splitext(name)[0]}_{variant}.'
+        f'{constant.IMAGE_VARIANT_EXTENSION}'
+    )
+
+
+class _AlreadyStored(Exception):
+    pass
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage saving files under sha256 of their content:
+    <upload_to>/<2 first hash chars>/<hash><ext>.
+    Content that is already stored is not written again.
+    Files are never deleted by models, unreferenced ones
+    are removed by collect_media_garbage command.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        return '/'.join(filter(None, (
+            os.path.dirname(name),
+            digest[:2],
+            digest + os.path.splitext(name)[1].lower(),
+        )))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.content_name(name, content)
+        try:
+            # Reused file gets fresh mtime, so collect_media_garbage
+            # keeps it until the referencing object is saved.
+            os.utime(self.path(name), None)
+            return name
+        except FileNotFoundError:
+            pass
+        try:
+            return self._save(name, content)
+        except _AlreadyStored:
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        # Called by _save only when the same content was written
+        # concurrently, so stored file can be reused.
+        raise _AlreadyStored
+
+    def delete(self, name):
+        """
+        Keep file as it may be referenced by other objects.
+        """
+
+    def purge(self, name):
+        """
+        Delete file from disk.
+        """
+
+        super().delete(name)
+
+
+content_storage = ContentAddressedStorage()
+
+
+def get_content_storage():
+    return content_storage